@@ -0,0 +1,126 @@
+import numpy as np
+from PIL import Image
+from profiling import profiled
+
+# Fixed colour vocabulary the dominant image colours are mapped to (sRGB)
+COLOR_VOCABULARY = {
+    'black': (20, 20, 20),
+    'white': (245, 245, 245),
+    'gray': (128, 128, 128),
+    'cream': (240, 228, 196),
+    'beige': (215, 195, 160),
+    'brown': (120, 72, 40),
+    'rust': (170, 70, 30),
+    'maroon': (120, 20, 40),
+    'red': (200, 30, 40),
+    'pink': (235, 140, 170),
+    'peach': (250, 190, 150),
+    'orange': (240, 130, 30),
+    'mustard': (210, 170, 40),
+    'yellow': (245, 225, 60),
+    'olive': (110, 115, 40),
+    'green': (50, 140, 70),
+    'teal': (20, 128, 128),
+    'blue': (40, 90, 190),
+    'navy': (25, 35, 90),
+    'purple': (120, 60, 150),
+}
+
+# Questions answered by the pixel-based colour stage instead of VQA
+COLOR_QUESTIONS = ("describe the shirt color", "describe the trouser color", "describe the dupatta color")
+
+SAMPLE_SIZE = 64          # images are downsampled to at most SAMPLE_SIZE x SAMPLE_SIZE pixels
+NUM_CLUSTERS = 6
+KMEANS_ITERATIONS = 12
+MIN_COVERAGE = 5          # colours covering less than this percentage are ignored
+BACKGROUND_DISTANCE = 12  # clusters this close (delta E) to the border colour are background
+
+_SRGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+_D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+def rgb_to_lab(rgb):
+    """Convert an array of sRGB values (0-255) to CIELAB."""
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = (c @ _SRGB_TO_XYZ.T) / _D65_WHITE
+    delta = 6 / 29
+    f = np.where(xyz > delta ** 3, np.cbrt(xyz), xyz / (3 * delta ** 2) + 4 / 29)
+    lab = np.empty_like(f)
+    lab[..., 0] = 116 * f[..., 1] - 16
+    lab[..., 1] = 500 * (f[..., 0] - f[..., 1])
+    lab[..., 2] = 200 * (f[..., 1] - f[..., 2])
+    return lab
+
+_VOCABULARY_NAMES = list(COLOR_VOCABULARY)
+_VOCABULARY_LAB = rgb_to_lab(np.array(list(COLOR_VOCABULARY.values())))
+
+def kmeans(points, k=NUM_CLUSTERS, iterations=KMEANS_ITERATIONS, seed=0):
+    """Cluster points with k-means, returning centroids and per-point labels."""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(points))
+
+    # k-means++ initialisation
+    centroids = [points[rng.integers(len(points))]]
+    for _ in range(1, k):
+        dist = np.min(((points[:, None, :] - np.array(centroids)[None, :, :]) ** 2).sum(axis=2), axis=1)
+        if dist.sum() == 0:
+            break
+        centroids.append(points[rng.choice(len(points), p=dist / dist.sum())])
+    centroids = np.array(centroids)
+
+    labels = None
+    for _ in range(iterations):
+        dist = ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        new_labels = dist.argmin(axis=1)
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+        counts = np.bincount(labels, minlength=len(centroids))
+        for dim in range(points.shape[1]):
+            sums = np.bincount(labels, weights=points[:, dim], minlength=len(centroids))
+            # Empty clusters keep their previous centroid
+            centroids[:, dim] = np.where(counts > 0, sums / np.maximum(counts, 1), centroids[:, dim])
+
+    return centroids, labels
+
+def load_pixels(image, size=SAMPLE_SIZE):
+    """Downsample an image and return its pixels as an (height, width, 3) array."""
+    image = image.convert("RGB")
+    image.thumbnail((size, size), Image.BILINEAR)
+    return np.asarray(image)
+
+@profiled()
+def extract_colors(image, k=NUM_CLUSTERS, min_coverage=MIN_COVERAGE):
+    """Return the dominant colours of a product image as (name, coverage %) pairs."""
+    lab = rgb_to_lab(load_pixels(image))
+    border = np.concatenate([lab[0], lab[-1], lab[:, 0], lab[:, -1]])
+    background = np.median(border, axis=0)
+
+    points = lab.reshape(-1, 3)
+    centroids, labels = kmeans(points, k)
+    counts = np.bincount(labels, minlength=len(centroids))
+
+    # Drop background clusters so the studio backdrop does not dominate the colours
+    foreground = np.linalg.norm(centroids - background, axis=1) > BACKGROUND_DISTANCE
+    if not foreground.any():
+        foreground[:] = True
+
+    names = np.linalg.norm(centroids[:, None, :] - _VOCABULARY_LAB[None, :, :], axis=2).argmin(axis=1)
+    coverage = {}
+    total = counts[foreground].sum()
+    for cluster in np.flatnonzero(foreground):
+        name = _VOCABULARY_NAMES[names[cluster]]
+        coverage[name] = coverage.get(name, 0) + 100 * counts[cluster] / total
+
+    ranked = sorted(coverage.items(), key=lambda x: x[1], reverse=True)
+    return [(name, round(pct)) for name, pct in ranked if pct >= min_coverage]
+
+def format_colors(colors):
+    """Format colours as the names column and the coverage column."""
+    names = ' '.join(name for name, _ in colors)
+    coverage = ' '.join(f"{name}:{pct}" for name, pct in colors)
+    return names, coverage
@@ -0,0 +1,312 @@
+import time
+import heapq
+import random
+import argparse
+import threading
+import urllib.request
+from collections import deque
+from itertools import count
+from urllib.parse import urlparse
+from tqdm import tqdm
+
+# Lower values are crawled first
+PRIORITY_NEW = 0
+PRIORITY_REFRESH = 1
+
+class CrawlTask:
+    """A URL waiting to be crawled."""
+
+    def __init__(self, url, priority=PRIORITY_NEW):
+        self.url = url
+        self.priority = priority
+        self.host = urlparse(url).netloc
+        self.attempts = 0
+
+class HostLimiter:
+    """Per-host concurrency limit and pacing, adapted with AIMD to latency and errors."""
+
+    def __init__(self, initial=1, minimum=1, maximum=4, target_latency=10.0,
+                 min_timeout=15.0, max_timeout=120.0, max_delay=30.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.latency = None     # exponentially weighted moving average, seconds
+        self.delay = 0.0        # minimum gap between two requests to the host
+        self.next_start = 0.0
+
+    def can_start(self, now):
+        return self.in_flight < int(self.limit) and now >= self.next_start
+
+    def start(self, now):
+        self.in_flight += 1
+        self.next_start = now + self.delay
+
+    def record(self, latency, ok):
+        """Additively grow the limit on fast successes, halve it on slow responses or errors."""
+        self.in_flight -= 1
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        if not ok:
+            self.error()
+            return
+
+        self.delay /= 2
+        if latency <= self.target_latency:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        else:
+            self.limit = max(self.minimum, self.limit / 2)
+
+    def error(self):
+        """Halve the limit after an error from the host."""
+        # Once down to one request at a time, back off further by spacing requests out
+        if self.limit <= self.minimum:
+            self.delay = min(self.max_delay, max(1.0, self.delay * 2))
+        self.limit = max(self.minimum, self.limit / 2)
+
+    def timeout(self):
+        """Page load timeout derived from the latency observed so far."""
+        if self.latency is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, 4 * self.latency))
+
+class CrawlStats:
+    """Live counters for a crawl."""
+
+    def __init__(self, window=100):
+        self.started = time.monotonic()
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.in_flight = 0
+        self.outcomes = deque(maxlen=window)    # True for errors, over the last `window` attempts
+        self.latencies = deque(maxlen=window)
+
+    def summary(self, limiters=None):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        summary = {
+            'completed': self.completed,
+            'failed': self.failed,
+            'retried': self.retried,
+            'in_flight': self.in_flight,
+            'pages_per_second': round(self.completed / elapsed, 3),
+            'error_rate': round(sum(self.outcomes) / len(self.outcomes), 3) if self.outcomes else 0.0,
+            'mean_latency': round(sum(self.latencies) / len(self.latencies), 3) if self.latencies else None,
+        }
+        if limiters:
+            summary['limits'] = {host: round(limiter.limit, 2) for host, limiter in limiters.items()}
+        return summary
+
+class CrawlScheduler:
+    """Crawl URLs with worker threads, per-host adaptive limits, priorities and retries with backoff."""
+
+    def __init__(self, workers=2, max_attempts=4, backoff_base=2.0, backoff_cap=120.0,
+                 retry_on=(Exception,), limiter_options=None):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.retry_on = retry_on
+        self.limiter_options = limiter_options or {}
+        self.limiters = {}
+        self.stats = CrawlStats()
+        self.results = []
+        self.failures = []
+        self._ready = {}        # host -> heap of (priority, seq, task)
+        self._delayed = {}      # host -> heap of (not_before, seq, task)
+        self._seq = count()
+        self._total = 0
+        self._cond = threading.Condition()
+
+    def add(self, url, priority=PRIORITY_NEW):
+        """Queue a URL to be crawled."""
+        with self._cond:
+            self._push(CrawlTask(url, priority))
+            self._total += 1
+            self._cond.notify()
+
+    def _push(self, task, not_before=0.0):
+        if task.host not in self.limiters:
+            self.limiters[task.host] = HostLimiter(**self.limiter_options)
+            self._ready[task.host] = []
+            self._delayed[task.host] = []
+        if not_before:
+            heapq.heappush(self._delayed[task.host], (not_before, next(self._seq), task))
+        else:
+            heapq.heappush(self._ready[task.host], (task.priority, next(self._seq), task))
+
+    def _pending(self):
+        return any(self._ready.values()) or any(self._delayed.values())
+
+    def _next_task(self):
+        """Block until a task can start, or return None when the crawl is finished."""
+        with self._cond:
+            while True:
+                if not self._pending():
+                    if self.stats.in_flight == 0:
+                        self._cond.notify_all()
+                        return None
+                    self._cond.wait()
+                    continue
+
+                now = time.monotonic()
+                wake = now + 1.0
+                best = None
+                for host, limiter in self.limiters.items():
+                    # Move retries whose backoff has expired back into the ready queue
+                    delayed = self._delayed[host]
+                    while delayed and delayed[0][0] <= now:
+                        _, _, task = heapq.heappop(delayed)
+                        heapq.heappush(self._ready[host], (task.priority, next(self._seq), task))
+                    if delayed:
+                        wake = min(wake, delayed[0][0])
+
+                    ready = self._ready[host]
+                    if ready and limiter.can_start(now):
+                        if best is None or ready[0][:2] < self._ready[best][0][:2]:
+                            best = host
+                    elif ready and limiter.in_flight < int(limiter.limit):
+                        wake = min(wake, limiter.next_start)
+
+                if best is not None:
+                    _, _, task = heapq.heappop(self._ready[best])
+                    self.limiters[best].start(now)
+                    self.stats.in_flight += 1
+                    task.attempts += 1
+                    return task
+
+                self._cond.wait(max(wake - now, 0.01))
+
+    def _finish(self, task, latency, result=None, error=None, transient=False):
+        with self._cond:
+            self.stats.in_flight -= 1
+            limiter = self.limiters[task.host]
+            # Only transient errors say something about the host's health
+            limiter.record(latency, ok=error is None or not transient)
+            self.stats.outcomes.append(error is not None)
+            self.stats.latencies.append(latency)
+
+            if error is None:
+                self.stats.completed += 1
+                self.results.append((task.url, result))
+            elif transient and task.attempts < self.max_attempts:
+                self.stats.retried += 1
+                self._push(task, time.monotonic() + self.backoff(task.attempts))
+            else:
+                self.stats.failed += 1
+                self.failures.append((task.url, error))
+            self._cond.notify_all()
+
+    def host_error(self, url):
+        """Count an error that did not fail the task, e.g. a swallowed request while processing, against its host."""
+        with self._cond:
+            limiter = self.limiters.get(urlparse(url).netloc)
+            if limiter is not None:
+                limiter.error()
+
+    def backoff(self, attempts):
+        """Exponential backoff with jitter for the given number of attempts made."""
+        delay = min(self.backoff_cap, self.backoff_base * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _worker(self, fetch, process, setup, teardown):
+        state = setup() if setup else None
+        try:
+            while True:
+                task = self._next_task()
+                if task is None:
+                    break
+                timeout = self.limiters[task.host].timeout()
+                start = time.monotonic()
+                latency = None
+                try:
+                    result = fetch(state, task.url, timeout)
+                    # Only the fetch is timed, so the limits follow the host rather than the processing
+                    latency = time.monotonic() - start
+                    if process is not None:
+                        result = process(state, task.url, result)
+                except self.retry_on as e:
+                    self._finish(task, latency if latency is not None else time.monotonic() - start, error=e,
+                                 transient=True)
+                except Exception as e:
+                    self._finish(task, latency if latency is not None else time.monotonic() - start, error=e)
+                else:
+                    self._finish(task, latency, result=result)
+        finally:
+            if teardown and state is not None:
+                teardown(state)
+
+    def run(self, fetch, setup=None, teardown=None, desc="Crawling", process=None):
+        """
+        Crawl every queued URL and return the results and failures.
+
+        :param fetch: Called as fetch(state, url, timeout) in a worker thread; raises on failure.
+            Its duration is the latency the per-host limits adapt to.
+        :param process: Called as process(state, url, fetched) after a successful fetch, untimed;
+            its return value is the result. Its transient errors are retried and count against the host.
+        :param setup: Creates the per-worker state (e.g. a browser), passed to fetch.
+        :param teardown: Releases the per-worker state.
+        """
+        threads = [threading.Thread(target=self._worker, args=(fetch, process, setup, teardown), daemon=True)
+                   for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        with tqdm(total=self._total, desc=desc) as progress:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(0.5)
+                progress.total = self._total
+                progress.n = self.stats.completed + self.stats.failed
+                progress.set_postfix(self.live_stats())
+
+        return self.results, self.failures
+
+    def live_stats(self):
+        with self._cond:
+            summary = self.stats.summary(self.limiters)
+        limits = summary.pop('limits')
+        summary['limit'] = ' '.join(f"{limit}" for limit in limits.values())
+        return summary
+
+def fetch_url(state, url, timeout):
+    """Fetch a URL with urllib, used when crawling the stand-in server."""
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return len(response.read())
+
+def main():
+    """Crawl the local stand-in server and degrade it halfway to show the scheduler adapting."""
+    from stand_in_server import StandInServer
+
+    parser = argparse.ArgumentParser(description="Exercise the crawl scheduler against a local stand-in server.")
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--degraded-latency', type=float, default=0.3)
+    parser.add_argument('--degraded-error-rate', type=float, default=0.3)
+    args = parser.parse_args()
+
+    server = StandInServer(latency=args.latency)
+    base_url = server.start()
+    scheduler = CrawlScheduler(workers=args.workers, backoff_base=0.2, backoff_cap=2.0,
+                               limiter_options={'maximum': args.workers, 'target_latency': 0.2,
+                                                'min_timeout': 1.0, 'max_timeout': 5.0, 'max_delay': 1.0})
+    for index in range(args.pages):
+        scheduler.add(f"{base_url}/product-{index}.html", PRIORITY_NEW if index % 2 else PRIORITY_REFRESH)
+
+    def degrade():
+        while scheduler.stats.completed < args.pages // 2:
+            time.sleep(0.05)
+        print("\nDegrading stand-in server...")
+        server.set_conditions(latency=args.degraded_latency, error_rate=args.degraded_error_rate)
+
+    threading.Thread(target=degrade, daemon=True).start()
+    results, failures = scheduler.run(fetch_url)
+    server.stop()
+    print(scheduler.stats.summary(scheduler.limiters))
+    print(f"Fetched {len(results)} pages, {len(failures)} failed")
+
+if __name__ == '__main__':
+    main()
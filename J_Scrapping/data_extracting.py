@@ -6,32 +6,35 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 logging.getLogger('tensorflow').setLevel(logging.FATAL)
 
 import os
-import math
+import re
 import pandas as pd
+import socket
+import urllib.error
 import urllib.request
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from tqdm import tqdm
+from crawl_scheduler import CrawlScheduler, PRIORITY_NEW, PRIORITY_REFRESH
+from page_archive import HtmlPage, load_page, archive_page
+from profiling import profiled
 
-def get_total_products(driver, url):
-    """Get the total number of products on the page."""
-    print(f"Loading URL: {url}")
-    driver.get(url)
-    wait = WebDriverWait(driver, 30)
-    total = wait.until(EC.presence_of_element_located((By.ID, "toolbar-amount")))
-    
-    is_paging = check_if_paging(driver)
-    
-    if is_paging:
-        total_products = int(total.text.split(" ")[-1])
-    else:
-        total_products = int(total.text.split(" ")[0])
+# HTTP status of the page the browser loaded, from the Navigation Timing API (0 if not reported)
+NAVIGATION_STATUS_SCRIPT = ("const entry = performance.getEntriesByType('navigation')[0];"
+                            "return entry ? entry.responseStatus : null;")
+
+# Error page titles, for when the status is not reported; product titles end in their code, so only the start counts
+BUSY_TITLE = re.compile(r"^\s*(?:429|5\d\d)\b|service (?:temporarily )?unavailable|too many requests|bad gateway|"
+                        r"gateway time-?out|error processing your request", re.IGNORECASE)
+NOT_FOUND_TITLE = re.compile(r"^\s*404\b|^\s*page not found", re.IGNORECASE)
 
-    print(f"Total products found: {total_products}")
-    return total_products, is_paging
+class ErrorPage(Exception):
+    """The site answered with an error page instead of the requested page."""
+
+class ServerBusyPage(ErrorPage):
+    """A 5xx or 429 error page: the host is failing or overloaded, so the request is retried."""
 
 def check_if_paging(driver):
     """Check if paging is present on the page."""
@@ -41,55 +44,21 @@ def check_if_paging(driver):
     except NoSuchElementException:
         return False
 
-def get_pagination_links(driver, main_page, total_products, products_per_page=36):
-    """Get all pagination links."""
-    print("Collecting pagination links...")
-    page_urls = [main_page]
-    max_page = math.ceil(total_products / products_per_page)
-    
-    for page_number in range(1, max_page + 1):
-        page_url = f"{main_page}?p={page_number}"
-        print(f"Loading page: {page_url}")
-        driver.get(page_url)
-        wait = WebDriverWait(driver, 60)
-        pagination_container = wait.until(EC.presence_of_element_located((By.CLASS_NAME, "pages-items")))
-        pagination_links = pagination_container.find_elements(By.CLASS_NAME, "page")
-        page_urls = get_page_url(pagination_links, page_urls)
-    
-    print(f"Total pagination links collected: {len(page_urls)}")
-    return page_urls
-
-def get_page_url(pagination_links, page_urls):
-    for link in pagination_links:
-        url = link.get_attribute('href')
-        if url and url not in page_urls:
-            page_urls.append(url)
-                
-    return page_urls
-
-def get_product_links(driver, page_urls):
-    """Get all product links from the page URLs."""
-    print("Collecting product links...")
-    items_link = []
-    
-    for url in tqdm(page_urls, desc="Product Links"):
-        driver.get(url)
-        ul_element = driver.find_elements(By.CLASS_NAME, 'product-item')
-        for item in ul_element:
-            prod_link = item.find_element(By.CLASS_NAME, 'product-item-link').get_attribute('href')
-            if prod_link:
-                items_link.append(prod_link)
-    
-    unique_links = list(set(items_link))
-    print(f"Total unique product links collected: {len(unique_links)}")
-    return unique_links
+def read_product_links(page):
+    """Read the product links from a loaded listing page."""
+    links = []
+    for item in page.find_elements(By.CLASS_NAME, 'product-item'):
+        prod_link = item.find_element(By.CLASS_NAME, 'product-item-link').get_attribute('href')
+        if prod_link:
+            links.append(prod_link)
+    return links
 
 def remove_existing_links(items_link, csv_file_path):
     """Remove existing product links if they already exist in the CSV file."""
     print(f"Checking for existing links in: {csv_file_path}")
     if os.path.exists(csv_file_path):
         existing_data = pd.read_csv(csv_file_path)
-        existing_links = existing_data['Link'].tolist()
+        existing_links = set(existing_data['Link'])
         items_link = [x for x in items_link if x not in existing_links]
         print(f"New product links after removing existing ones: {len(items_link)}")
     else:
@@ -97,6 +66,16 @@ def remove_existing_links(items_link, csv_file_path):
     
     return items_link
 
+def stale_links(items_link, csv_file_path, archive, max_age_days):
+    """Return the links already in the CSV file whose archived page is older than max_age_days or missing."""
+    if not os.path.exists(csv_file_path):
+        return []
+    existing_links = set(pd.read_csv(csv_file_path)['Link'])
+    stale = set(archive.stale_urls(max_age_days, 'product'))
+    refresh_links = [x for x in items_link if x in existing_links and (x in stale or x not in archive)]
+    print(f"Existing product links due for a refresh: {len(refresh_links)}")
+    return refresh_links
+
 def update_image_url(url, new_width, new_height):
     """Update image URL with new dimensions."""
     parsed_url = urlparse(url)
@@ -107,10 +86,40 @@ def update_image_url(url, new_width, new_height):
     new_url = urlunparse(parsed_url._replace(query=new_query_string))
     return new_url
 
-def fetch_product_page(driver, link, timeout=120):
-    """Fetch the product page."""
-    driver.get(link)
-    return WebDriverWait(driver, timeout)
+def response_status(page):
+    """HTTP status of the loaded page, or None if the browser does not report it (e.g. archived pages)."""
+    if not hasattr(page, 'execute_script'):
+        return None
+    try:
+        return page.execute_script(NAVIGATION_STATUS_SCRIPT) or None
+    except WebDriverException:
+        return None
+
+def page_title(page):
+    titles = page.find_elements(By.TAG_NAME, 'title')
+    return (titles[0].get_attribute('textContent') or '').strip() if titles else ''
+
+def check_error_page(page, link):
+    """Raise ServerBusyPage or ErrorPage if the browser loaded an error page rather than the product."""
+    status = response_status(page)
+    if status is None:
+        title = page_title(page)
+        if BUSY_TITLE.search(title):
+            raise ServerBusyPage(f"Error page '{title}' for {link}")
+        if NOT_FOUND_TITLE.search(title):
+            raise ErrorPage(f"Error page '{title}' for {link}")
+    elif status == 429 or status >= 500:
+        raise ServerBusyPage(f"HTTP {status} for {link}")
+    elif status >= 400:
+        raise ErrorPage(f"HTTP {status} for {link}")
+
+@profiled()
+def fetch_product_page(driver, link, timeout=120, archive=None):
+    """Fetch the product page, reusing the archived copy if it has not changed."""
+    page = load_page(driver, link, archive)
+    # Browsers render error responses like any page, which would only show as missing elements
+    check_error_page(page, link)
+    return page, WebDriverWait(page, timeout)
 
 
 def get_product_basic_info(driver, wait):
@@ -146,14 +155,41 @@ def get_image_sources(driver):
     return [img.get_attribute('src') for img in sources]
 
 
+def image_path(code, index, image_save_dir):
+    return os.path.join(image_save_dir, f"{code}_{index+1}.jpg")
+
+@profiled()
 def download_image(src_url, code, index, image_save_dir):
     """Download image from the given source URL."""
     new_url = update_image_url(src_url, 1000, 778.5)
-    file_path = os.path.join(image_save_dir, f"{code}_{index+1}.jpg")
-    urllib.request.urlretrieve(str(new_url), file_path)
+    urllib.request.urlretrieve(str(new_url), image_path(code, index, image_save_dir))
 
+def download_images(page, image_sources, code, image_save_dir):
+    """Download the product's images; an unchanged page from the archive keeps the images already saved."""
+    for index, src_url in enumerate(image_sources):
+        if isinstance(page, HtmlPage) and os.path.exists(image_path(code, index, image_save_dir)):
+            continue
+        download_image(src_url, code, index, image_save_dir)
 
-def scrape_product_details(driver, items_link, image_save_dir):
+
+def extract_product(page, wait, link):
+    """Extract the product record and its image sources from a loaded product page."""
+    prod_price, prod_name, prod_description = get_product_basic_info(page, wait)
+    more_info = get_product_additional_info(page)
+    name, code = extract_name_and_code(prod_name)
+
+    product = {
+        'Name': name,
+        'Code': code,
+        'Link': link,
+        'Price': prod_price,
+        'Description': prod_description,
+        'More info': more_info
+    }
+    return product, get_image_sources(page)
+
+
+def scrape_product_details(driver, items_link, image_save_dir, archive=None):
     """Scrape product details and download images."""
     print("Scraping product details...")
     products = []
@@ -162,23 +198,11 @@ def scrape_product_details(driver, items_link, image_save_dir):
     
     for link in tqdm(items_link, desc="Scraping Products"):
         try:
-            wait = fetch_product_page(driver, link)
-            prod_price, prod_name, prod_description = get_product_basic_info(driver, wait)
-            more_info = get_product_additional_info(driver)
-            name, code = extract_name_and_code(prod_name)
-            
-            products.append({
-                'Name': name,
-                'Code': code,
-                'Link': link,
-                'Price': prod_price,
-                'Description': prod_description,
-                'More info': more_info
-            })
-            
-            image_sources = get_image_sources(driver)
-            for index, src_url in enumerate(image_sources):
-                download_image(src_url, code, index, image_save_dir)
+            page, wait = fetch_product_page(driver, link, archive=archive)
+            product, image_sources = extract_product(page, wait, link)
+            products.append(product)
+            archive_page(archive, page, link, 'product')
+            download_images(page, image_sources, product['Code'], image_save_dir)
         
         except TimeoutException:
             timeout_prds.append(link)
@@ -190,6 +214,47 @@ def scrape_product_details(driver, items_link, image_save_dir):
     return products
 
 
+def scrape_products_scheduled(make_driver, items_link, image_save_dir, archive=None, workers=2,
+                              refresh_links=(), limiter_options=None):
+    """Scrape product details with several browsers, adaptive per-host limits and retries."""
+    print("Scraping product details...")
+    # Timeouts, network errors and busy pages are retried with backoff, anything else fails the product
+    scheduler = CrawlScheduler(workers, retry_on=(TimeoutException, ServerBusyPage, urllib.error.URLError, socket.timeout,
+                                                  ConnectionError), limiter_options=limiter_options)
+    for link in items_link:
+        scheduler.add(link, PRIORITY_NEW)
+    for link in refresh_links:
+        scheduler.add(link, PRIORITY_REFRESH)
+
+    def fetch(driver, link, timeout):
+        # A page load timeout raises TimeoutException here, which is retried
+        driver.set_page_load_timeout(timeout)
+        return fetch_product_page(driver, link, timeout, archive)
+
+    def process(driver, link, fetched):
+        page, wait = fetched
+        try:
+            product, image_sources = extract_product(page, wait, link)
+        except TimeoutException as e:
+            # The page has loaded, so a wait timing out means the element is missing and a retry will not find it
+            raise NoSuchElementException(f"Timed out waiting for product details: {e.msg}") from e
+        # The validator request does not fail the product, but its errors still say the host is struggling
+        archive_page(archive, page, link, 'product', on_error=lambda url, error: scheduler.host_error(url))
+        download_images(page, image_sources, product['Code'], image_save_dir)
+        return product
+
+    results, failures = scheduler.run(fetch, setup=make_driver, teardown=lambda driver: driver.quit(),
+                                      desc="Scraping Products", process=process)
+    timeout_prds = [link for link, error in failures if isinstance(error, TimeoutException)]
+    error_prds = [(link, str(error)) for link, error in failures if not isinstance(error, TimeoutException)]
+
+    handle_scrape_errors(timeout_prds, error_prds)
+    print(f"Crawl stats: {scheduler.stats.summary(scheduler.limiters)}")
+    products = [product for _, product in results]
+    print(f"Total products scraped: {len(products)}")
+    return products
+
+
 def handle_scrape_errors(timeout_prds, error_prds):
     """Handle and log errors that occurred during scraping."""
     for link in timeout_prds:
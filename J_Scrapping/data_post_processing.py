@@ -3,6 +3,7 @@ import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from nltk.stem import WordNetLemmatizer
+from profiling import profiled
 
 # Download necessary NLTK data (run these once)
 nltk.download('punkt')
@@ -45,18 +46,19 @@ def post_processing(df):
     # Specify the columns to process
     cols = ['Fabric Type', 'Neckline', 'Collection', 'Shirt Front', 'Shirt Back', 'Trouser',
             'Sleeves', 'Style Cut', 'Length', 'Embellishment', 'Type', 'Color', 
-            'Product Category', 'Season', 'Size', 'Design', 'Shirt Pattern', 
+            'Product Category', 'Season', 'Design', 'Shirt Pattern', 
             'Shirt color', 'Shirt Sleeves', 'Shirt Length', 'Shirt Daman', 
             'Shirt Neckline', 'if multicolored', 'Trouser Pattern', 'Trouser Color', 
             'Trouser Length', 'Trouser Style', 'Is Dupatta Printed', 'Dupatta Pattern', 
             'Dupatta Color', 'Sleeves Pattern', 'shirt material', 'trouser material', 
-            'dupatta material']
+            'dupatta material', 'Image Color']
     cols=[col for col in cols if col in df.columns]
     # Initialize NLTK components
     stop_words = set(stopwords.words('english'))
     lemmatizer = WordNetLemmatizer()
 
     # Define a function to process text into keywords
+    @profiled("extract_keywords")
     def extract_keywords(text):
         if pd.isna(text):
             return ''
@@ -70,6 +72,17 @@ def post_processing(df):
         # Return keywords as a space-separated string
         return ', '.join(filtered_tokens)
 
+    # rename_columns gives some VQA answers the name of a description feature (e.g. 'Shirt Length');
+    # merge such duplicate columns so each name is processed as one column
+    for col in df.columns[df.columns.duplicated()].unique():
+        merged = df[col].apply(lambda row: ', '.join(str(v) for v in row if not pd.isna(v)) or None, axis=1)
+        df = df.drop(columns=col)
+        df[col] = merged
+
+    # Keep the product category as-is for the typed category column
+    if 'Product Category' in df.columns:
+        df['Category'] = df['Product Category']
+
     # Apply the function to the specified columns
     print("Processing columns for keyword extraction...")
     for col in cols:
@@ -86,7 +99,7 @@ def post_processing(df):
     df = combine_columns(df, 'Shirt', 'Shirt Front', 'Shirt Pattern', 'Shirt Back', 'Style Cut', 'Shirt Length', 'Shirt Daman', 'Length')
     df = combine_columns(df, 'Trouser', 'Trouser', 'Trouser Pattern', 'Trouser Length', 'Trouser Style')
     df = combine_columns(df, 'Dupatta', 'Dupatta Pattern')
-    df = combine_columns(df, 'Color', 'Color', 'Shirt color', 'Trouser Color', 'Dupatta Color')
+    df = combine_columns(df, 'Color', 'Color', 'Shirt color', 'Trouser Color', 'Dupatta Color', 'Image Color')
     df = combine_columns(df, 'Sleeves', 'Sleeves', 'Sleeves Pattern', 'Shirt Sleeves')
 
     print("Dropping unnecessary columns...")
@@ -94,12 +107,17 @@ def post_processing(df):
              'Product Category', 'Type', 'Shirt Front', 'Shirt Pattern', 'Shirt Back', 'Style Cut', 
              'Shirt Length', 'Shirt Daman', 'Length', 'Trouser Pattern', 'Trouser Length', 'Trouser Style', 
              'Dupatta Pattern', 'Shirt color', 'Shirt Sleeves', 'if multicolored', 'Is Dupatta Printed', 
-             'Dupatta Color', 'Sleeves Pattern']
+             'Dupatta Color', 'Sleeves Pattern', 'Image Color']
     extra_cols = [col for col in extra_cols if col in df.columns]
     df.drop(extra_cols, axis=1, inplace=True)
     
-    # Apply the clean_cell function to each cell in the DataFrame
-    df = df.applymap(clean_cell)
+    # Apply the clean_cell function to each cell in the DataFrame. Price, size and category are kept
+    # verbatim: they are parsed into typed columns at load time, keyword extraction drops the digits
+    # of sizes ('3 piece' becomes 'piece'), and clean_cell splits on commas and reorders the parts
+    # ('pkr 6,050.00' can become '050.00 pkr 6')
+    raw_cols = [col for col in ('Price', 'Size', 'Category') if col in df.columns]
+    cleaned_cols = [col for col in df.columns if col not in raw_cols]
+    df[cleaned_cols] = df[cleaned_cols].applymap(clean_cell)
     print("Post-processing complete!")
     
     return df
@@ -1,7 +1,72 @@
+import re
 import pandas as pd
 import json
 import mysql.connector
 from mysql.connector import errorcode
+from profiling import profiled
+
+# Product categories known to the pipeline; anything else is stored as 'other'
+CATEGORIES = (
+    'unstitched 1 piece',
+    'unstitched 2 piece - shirt and dupatta',
+    'unstitched 2 piece - shirt and trouser',
+    'unstitched 3 piece',
+    'ladies kurti',
+    '2 piece stitched',
+    '3 piece stitched',
+    'other',
+)
+
+# Typed columns parsed once at ingest, next to the original text columns
+TYPED_COLUMNS = {
+    'price_minor': "INT UNSIGNED NULL",
+    'pieces': "TINYINT UNSIGNED NULL",
+    'category': "ENUM({}) NULL".format(', '.join(f"'{category}'" for category in CATEGORIES)),
+    'created_at': "TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+    'updated_at': "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP",
+}
+
+# Scraped text columns; a product whose values are unchanged keeps its updated_at across reloads
+CONTENT_COLUMNS = "price, code, `Fabric Type`, Neckline, Collection, Trouser, Sleeves, Embellishment, Color, Size, Shirt, Dupatta"
+
+# Columns covered by the FULLTEXT index used by /search
+FULLTEXT_COLUMNS = "link, `Fabric Type`, Neckline, Collection, Trouser, Sleeves, Embellishment, Color, Shirt, Dupatta"
+
+# B-tree indexes for price filters/sorting, alone or combined with piece count or category
+TYPED_INDEXES = {
+    'idx_price': "price_minor",
+    'idx_pieces_price': "pieces, price_minor",
+    'idx_category_price': "category, price_minor",
+}
+
+class CatalogueReloadError(Exception):
+    """The shadow table cannot be swapped in, or there is no previous version to roll back to."""
+
+def parse_price(price):
+    """Parse a price like 'pkr 6 050.00' or 'PKR 6,050.00' into minor units (paisa)."""
+    if pd.isna(price):
+        return None
+    digits = re.sub(r"[^\d.]", "", str(price))
+    if not digits or digits == '.':
+        return None
+    return round(float(digits) * 100)
+
+def parse_pieces(*texts):
+    """Find the piece count ('3 piece', '2pc') in the first text that mentions one."""
+    for text in texts:
+        if pd.isna(text):
+            continue
+        match = re.search(r"(\d+)\s*(?:piece|pc)", str(text).lower())
+        if match:
+            return int(match.group(1))
+    return None
+
+def parse_category(category):
+    """Map a product category onto the category enum."""
+    if pd.isna(category) or not str(category).strip():
+        return None
+    category = ' '.join(str(category).lower().split())
+    return category if category in CATEGORIES else 'other'
 
 def get_db_connection(host, user, password, database):
     return mysql.connector.connect(
@@ -13,21 +78,46 @@ def get_db_connection(host, user, password, database):
     )
 
 def create_table(cursor, table_name):
+    typed_columns = ''.join(f", {column} {definition}" for column, definition in TYPED_COLUMNS.items())
+    indexes = ''.join(f", INDEX {index} ({columns})" for index, columns in TYPED_INDEXES.items())
+    # doc_id numbers the rows of a catalogue version; the search service keys its facet bitmaps on it
     cursor.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ("
+                   "doc_id INT UNSIGNED NOT NULL, "
                    "link TEXT, price TEXT, code TEXT, `Fabric Type` TEXT, Neckline TEXT, Collection TEXT,"
                    "Trouser TEXT, Sleeves TEXT, Embellishment TEXT, Color TEXT, Size TEXT, Shirt TEXT,"
-                   "Dupatta TEXT);")
+                   f"Dupatta TEXT{typed_columns}, PRIMARY KEY (doc_id){indexes});")
     if cursor:
         print(f"Table {table_name} created successfully.")
     else:
         print(f"Error creating table {table_name}.")
 
+def normalize_columns(df):
+    """Lowercase the column names, merging columns that only differ in case (e.g. 'link' and 'Link')."""
+    df = df.copy()
+    df.columns = df.columns.str.lower()
+    for col in df.columns[df.columns.duplicated()].unique():
+        merged = df[col].bfill(axis=1).iloc[:, 0]
+        df = df.drop(columns=col)
+        df[col] = merged
+    return df
+
+def merge_catalogue(existing, new):
+    """
+    Append new rows to the catalogue; refreshed products replace their earlier rows.
+
+    The existing columns take the new rows' spelling, as older CSVs have lowercase headers (link, price, code).
+    """
+    spelling = {col.lower(): col for col in new.columns}
+    existing = existing.rename(columns={col: spelling[col.lower()] for col in existing.columns if col.lower() in spelling})
+    link = spelling.get('link')
+    if link is not None and link in existing.columns:
+        existing = existing[~existing[link].isin(new[link])]
+    return pd.concat([existing, new], ignore_index=True)
+
+@profiled()
 def load_data(cursor, table_name, df):
-    # Load the CSV file into a DataFrame
-    
-    
     # Normalize the DataFrame's column names to lowercase for matching
-    df.columns = df.columns.str.lower()
+    df = normalize_columns(df)
     
     # Define the required columns with their correct names
     required_columns = {
@@ -50,17 +140,24 @@ def load_data(cursor, table_name, df):
     # Map the normalized column names to the original case-sensitive names
     new_df = pd.DataFrame({required_columns[key]: df.get(key, pd.Series([None]*len(df))) for key in required_columns.keys()})
 
+    # Parse the typed columns once here so queries never parse text
+    categories = df['category'].tolist() if 'category' in df.columns else [None] * len(df)
+    typed_rows = [(parse_price(price), parse_pieces(size, category), parse_category(category))
+                  for price, size, category in zip(new_df['price'], new_df['Size'], categories)]
+    columns = ['doc_id'] + list(required_columns.values()) + ['price_minor', 'pieces', 'category']
+
     # Insert the new DataFrame into the SQL table
-    for _, row in new_df.iterrows():
-        placeholders = ', '.join(['%s'] * len(required_columns))
-        sql_query = f"""
-        INSERT INTO {table_name} 
-        ({', '.join(required_columns.values())})
-        VALUES ({placeholders})
-        """
+    placeholders = ', '.join(['%s'] * len(columns))
+    sql_query = f"""
+    INSERT INTO {table_name} 
+    ({', '.join(columns)})
+    VALUES ({placeholders})
+    """
 
-        # Execute the SQL query with the row data
-        cursor.execute(sql_query, tuple(row))
+    # Execute the SQL query with all rows; executemany sends them as multi-row inserts
+    rows = [(doc_id,) + tuple(row) + typed
+            for doc_id, (row, typed) in enumerate(zip(new_df.itertuples(index=False), typed_rows))]
+    cursor.executemany(sql_query, rows)
 
     # Check if data was inserted successfully
     if cursor.rowcount > 0:
@@ -69,12 +166,127 @@ def load_data(cursor, table_name, df):
         print(f"Error loading data into table {table_name}.")
 
 def add_fulltext_index(cursor, table_name):
-    cursor.execute(f"ALTER TABLE {table_name} "
-                   f"ADD FULLTEXT(link, `Fabric Type`, Neckline, Collection, Trouser, Sleeves, Embellishment, Color, Shirt, Dupatta);")
+    cursor.execute(f"ALTER TABLE {table_name} ADD FULLTEXT({FULLTEXT_COLUMNS});")
     if cursor:
         print(f"Fulltext index added successfully to table {table_name}.")
     else:
         print(f"Error adding fulltext index to table {table_name}.")
 
+def table_exists(cursor, table_name):
+    cursor.execute("SHOW TABLES LIKE %s;", (table_name,))
+    return cursor.fetchone() is not None
+
+def table_columns(cursor, table_name):
+    cursor.execute(f"SHOW COLUMNS FROM {table_name};")
+    return {row[0] for row in cursor.fetchall()}
+
+def count_rows(cursor, table_name):
+    cursor.execute(f"SELECT COUNT(*) FROM {table_name};")
+    return cursor.fetchone()[0]
+
+def validate_shadow_table(cursor, shadow_table, table_name, expected_rows, min_ratio=0.9):
+    """Check the shadow table holds every row and has not shrunk suspiciously against the live table."""
+    loaded = count_rows(cursor, shadow_table)
+    if loaded != expected_rows:
+        raise CatalogueReloadError(f"{shadow_table} has {loaded} rows, expected {expected_rows}.")
+    if table_exists(cursor, table_name):
+        live = count_rows(cursor, table_name)
+        if loaded < min_ratio * live:
+            raise CatalogueReloadError(f"{shadow_table} has {loaded} rows, fewer than {min_ratio:.0%} of the {live} live rows.")
+    return loaded
+
+def carry_timestamps(cursor, table_name, shadow_table):
+    """
+    Copy created_at from the live table to the shadow table by link, and updated_at for unchanged products.
+
+    Changed products get updated_at set to the time of the reload.
+    """
+    cursor.execute(f"SELECT link, {CONTENT_COLUMNS}, created_at, updated_at FROM {table_name};")
+    live = {row[0]: (row[1:-2], row[-2], row[-1]) for row in cursor.fetchall()}
+    cursor.execute(f"SELECT doc_id, link, {CONTENT_COLUMNS} FROM {shadow_table};")
+    unchanged, changed = [], []
+    for row in cursor.fetchall():
+        previous = live.get(row[1])
+        if previous is None:
+            continue
+        content, created_at, updated_at = previous
+        if tuple(row[2:]) == tuple(content):
+            unchanged.append((created_at, updated_at, row[0]))
+        else:
+            changed.append((created_at, row[0]))
+    if unchanged:
+        cursor.executemany(f"UPDATE {shadow_table} SET created_at = %s, updated_at = %s WHERE doc_id = %s;", unchanged)
+    if changed:
+        cursor.executemany(f"UPDATE {shadow_table} SET created_at = %s, updated_at = CURRENT_TIMESTAMP WHERE doc_id = %s;",
+                           changed)
+
+def read_version(cursor, table_name):
+    """Catalogue version number of a table, 0 if it has none (e.g. tables created before versions)."""
+    if not table_exists(cursor, f"{table_name}_version"):
+        return 0
+    cursor.execute(f"SELECT MAX(version) FROM {table_name}_version;")
+    return cursor.fetchone()[0] or 0
+
+def write_version(cursor, table_name, version):
+    """Give a table its one-row <table>_version table, which is renamed along with it."""
+    cursor.execute(f"DROP TABLE IF EXISTS {table_name}_version;")
+    cursor.execute(f"CREATE TABLE {table_name}_version (version INT UNSIGNED NOT NULL);")
+    cursor.execute(f"INSERT INTO {table_name}_version (version) VALUES (%s);", (version,))
+
+def swap_tables(cursor, table_name, shadow_table, previous_table):
+    """Atomically make the shadow table and its version live, keeping the live ones as the previous version."""
+    if table_exists(cursor, table_name):
+        if not table_exists(cursor, f"{table_name}_version"):
+            write_version(cursor, table_name, 0)
+        cursor.execute(f"DROP TABLE IF EXISTS {previous_table};")
+        cursor.execute(f"DROP TABLE IF EXISTS {previous_table}_version;")
+        cursor.execute(f"RENAME TABLE {table_name} TO {previous_table}, {table_name}_version TO {previous_table}_version, "
+                       f"{shadow_table} TO {table_name}, {shadow_table}_version TO {table_name}_version;")
+    else:
+        cursor.execute(f"RENAME TABLE {shadow_table} TO {table_name}, {shadow_table}_version TO {table_name}_version;")
+
+def reload_catalogue(connection, table_name, df, min_ratio=0.9):
+    """
+    Build the next catalogue version in a shadow table and swap it in.
+
+    The live table keeps serving searches while the shadow table is loaded and indexed,
+    and the replaced version is kept as <table>_prev for rollback_catalogue. Each version
+    is numbered in <table>_version, which the search service reads to notice a reload.
+    """
+    shadow_table = f"{table_name}_next"
+    previous_table = f"{table_name}_prev"
+    cursor = connection.cursor()
+
+    cursor.execute(f"DROP TABLE IF EXISTS {shadow_table};")
+    create_table(cursor, shadow_table)
+    load_data(cursor, shadow_table, df)
+    # Tables created before the typed columns have no timestamps to carry over
+    if table_exists(cursor, table_name) and {'created_at', 'updated_at'} <= table_columns(cursor, table_name):
+        carry_timestamps(cursor, table_name, shadow_table)
+    add_fulltext_index(cursor, shadow_table)
+    # Numbers are never reused, even after a rollback, so a cached version is never mistaken for a new one
+    write_version(cursor, shadow_table, max(read_version(cursor, table_name), read_version(cursor, previous_table)) + 1)
+    connection.commit()
 
+    rows = validate_shadow_table(cursor, shadow_table, table_name, len(df), min_ratio)
+    swap_tables(cursor, table_name, shadow_table, previous_table)
+    connection.commit()
+    cursor.close()
+    print(f"Catalogue reloaded: {table_name} now has {rows} rows, previous version kept in {previous_table}.")
 
+def rollback_catalogue(connection, table_name):
+    """Swap the previous catalogue version back in; the replaced one becomes the previous version."""
+    previous_table = f"{table_name}_prev"
+    swap_table = f"{table_name}_swap"
+    cursor = connection.cursor()
+    if not table_exists(cursor, previous_table):
+        raise CatalogueReloadError(f"No previous version {previous_table} to roll back to.")
+    for table in (table_name, previous_table):
+        if not table_exists(cursor, f"{table}_version"):
+            write_version(cursor, table, 0)
+    cursor.execute(f"RENAME TABLE {table_name} TO {swap_table}, {table_name}_version TO {swap_table}_version, "
+                   f"{previous_table} TO {table_name}, {previous_table}_version TO {table_name}_version, "
+                   f"{swap_table} TO {previous_table}, {swap_table}_version TO {previous_table}_version;")
+    connection.commit()
+    cursor.close()
+    print(f"Rolled back {table_name} to the previous version.")
@@ -0,0 +1,118 @@
+import re
+import sqlite3
+from itertools import count
+
+# SQLite index names are global rather than per table, so each gets a unique suffix
+_index_ids = count()
+
+def translate_mysql(sql):
+    """
+    Rewrite the MySQL-only syntax used by database.py into SQLite statements.
+
+    Returns a list of statements, since inline INDEX definitions become separate CREATE INDEX statements.
+    """
+    sql = sql.replace('%s', '?')
+    if re.match(r"\s*use \w+\s*;?\s*$", sql, re.IGNORECASE):
+        # One SQLite file is one database
+        return []
+    show_columns = re.match(r"\s*SHOW COLUMNS FROM (\w+)\s*;?\s*$", sql, re.IGNORECASE)
+    if show_columns:
+        return [f"SELECT name FROM pragma_table_info('{show_columns.group(1)}');"]
+    show_tables = re.match(r"\s*SHOW TABLES LIKE \?\s*;?\s*$", sql, re.IGNORECASE)
+    if show_tables:
+        return ["SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ?;"]
+    if re.match(r"\s*ALTER TABLE \w+ ADD FULLTEXT", sql, re.IGNORECASE):
+        # SQLite has no FULLTEXT indexes on regular tables
+        return []
+    rename = re.match(r"\s*RENAME TABLE (.+?)\s*;?\s*$", sql, re.IGNORECASE | re.DOTALL)
+    if rename:
+        # MySQL renames all pairs atomically; a savepoint gives the same all-or-nothing swap
+        pairs = [pair.split() for pair in rename.group(1).split(',')]
+        return (["SAVEPOINT rename_tables;"]
+                + [f"ALTER TABLE {old} RENAME TO {new};" for old, _, new in pairs]
+                + ["RELEASE rename_tables;"])
+
+    # FULLTEXT search becomes a count of the query's words found in the columns, see match_against
+    sql = re.sub(r"MATCH\(([^)]*)\)\s*AGAINST\(\?\s+IN NATURAL LANGUAGE MODE\)", r"match_against(?, \1)",
+                 sql, flags=re.IGNORECASE)
+    sql = re.sub(r"ENUM\((?:'[^']*'(?:,\s*)?)+\)", "TEXT", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\b(?:TINY|SMALL|BIG)?INT UNSIGNED\b", "INTEGER", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\s+ON UPDATE CURRENT_TIMESTAMP", "", sql, flags=re.IGNORECASE)
+
+    statements = []
+    table = re.match(r"\s*CREATE TABLE (?:IF NOT EXISTS )?(\w+)", sql, re.IGNORECASE)
+    if table:
+        for name, columns in re.findall(r",\s*INDEX (\w+) \(([^)]*)\)", sql, re.IGNORECASE):
+            statements.append(f"CREATE INDEX {name}_{next(_index_ids)} ON {table.group(1)} ({columns});")
+        sql = re.sub(r",\s*(?:FULLTEXT )?INDEX \w+ \([^)]*\)", "", sql, flags=re.IGNORECASE)
+    return [sql] + statements
+
+def match_against(query, *columns):
+    """
+    Relevance of a row for a FULLTEXT query: how many of the query's words appear in its columns.
+
+    Only whether a row matches follows MySQL; the scores are not MySQL's natural language relevance.
+    """
+    words = set(re.findall(r"\w+", ' '.join(str(column) for column in columns if column is not None).lower()))
+    return float(sum(word in words for word in set(re.findall(r"\w+", (query or '').lower()))))
+
+class StandInCursor:
+    """MySQL-style cursor over SQLite, so database code can run without a MySQL server."""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, params=()):
+        statements = translate_mysql(sql)
+        table = re.match(r"\s*CREATE TABLE IF NOT EXISTS (\w+)", sql, re.IGNORECASE)
+        if table and self._table_exists(table.group(1)):
+            # Nothing to do, and the table's indexes already exist
+            return
+        for index, statement in enumerate(statements):
+            self._cursor.execute(statement, tuple(params) if index == 0 else ())
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(sql.replace('%s', '?'), [tuple(params) for params in seq_of_params])
+
+    def _table_exists(self, table_name):
+        self._cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?;", (table_name,))
+        return self._cursor.fetchone() is not None
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return dict(row) if self._dictionary and row is not None else row
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        return [dict(row) for row in rows] if self._dictionary else [tuple(row) for row in rows]
+
+    def close(self):
+        self._cursor.close()
+
+class StandInConnection:
+    """MySQL-style connection over SQLite."""
+
+    def __init__(self, path=":memory:"):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.create_function("match_against", -1, match_against, deterministic=True)
+        if path != ":memory:":
+            # Readers see the last committed version while a writer loads, like InnoDB
+            self._connection.execute("PRAGMA journal_mode=WAL;")
+
+    def cursor(self, dictionary=False):
+        return StandInCursor(self._connection.cursor(), dictionary)
+
+    def commit(self):
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+def get_stand_in_connection(path=":memory:"):
+    return StandInConnection(path)
@@ -0,0 +1,133 @@
+import gzip
+import math
+import urllib.request
+import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
+from tqdm import tqdm
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from data_extracting import check_if_paging, read_product_links
+from page_archive import USER_AGENT, load_page, archive_page
+
+IMAGE_NAMESPACE = "http://www.google.com/schemas/sitemap-image/1.1"
+
+# Magento CMS pages that sit directly under the site root like products do
+CMS_PAGES = {'about-us.html', 'contact-us.html', 'privacy-policy.html', 'terms-and-conditions.html',
+             'faqs.html', 'store-locator.html', 'return-policy.html', 'shipping-policy.html'}
+
+def listing_urls(main_page, total_products, products_per_page=36):
+    """Compute the URLs of every listing page of a category; page 1 is the category page itself."""
+    max_page = max(1, math.ceil(total_products / products_per_page))
+    return [main_page] + [f"{main_page}?p={page_number}" for page_number in range(2, max_page + 1)]
+
+def read_total_products(page):
+    """Read the total number of products from a loaded listing page."""
+    wait = WebDriverWait(page, 30)
+    total = wait.until(EC.presence_of_element_located((By.ID, "toolbar-amount")))
+    if check_if_paging(page):
+        return int(total.text.split(" ")[-1])
+    return int(total.text.split(" ")[0])
+
+def discover_product_links(driver, main_page, products_per_page=36, archive=None):
+    """Collect product links of a category, loading each listing page exactly once."""
+    print(f"Loading URL: {main_page}")
+    page = load_page(driver, main_page, archive)
+    total_products = read_total_products(page)
+    print(f"Total products found: {total_products}")
+
+    # Dict keys keep the first-seen order and make de-duplication O(1)
+    links = dict.fromkeys(read_product_links(page))
+    archive_page(archive, page, main_page, 'listing')
+
+    for url in tqdm(listing_urls(main_page, total_products, products_per_page)[1:], desc="Product Links"):
+        page = load_page(driver, url, archive)
+        links.update(dict.fromkeys(read_product_links(page)))
+        archive_page(archive, page, url, 'listing')
+
+    print(f"Total unique product links collected: {len(links)}")
+    return list(links)
+
+def iter_sitemap(url, timeout=60):
+    """
+    Stream (loc, lastmod, images) entries from a sitemap, following sitemap indexes, without loading it whole.
+
+    images counts the entry's <image:image> children, which Magento only lists for products.
+    """
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT, 'Accept-Encoding': 'gzip'})
+    nested = []
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        stream = response
+        if url.endswith('.gz') or response.headers.get('Content-Encoding') == 'gzip':
+            stream = gzip.GzipFile(fileobj=response)
+
+        loc = lastmod = None
+        images = 0
+        context = ET.iterparse(stream, events=('start', 'end'))
+        _, root = next(context)
+        for event, elem in context:
+            if event != 'end':
+                continue
+            namespace, _, tag = elem.tag[1:].rpartition('}') if elem.tag.startswith('{') else ('', '', elem.tag)
+            if namespace == IMAGE_NAMESPACE:
+                # <image:loc> is the image's URL, not the page's
+                images += tag == 'image'
+            elif tag == 'loc':
+                loc = (elem.text or '').strip()
+            elif tag == 'lastmod':
+                lastmod = (elem.text or '').strip()
+            elif tag in ('url', 'sitemap'):
+                if tag == 'url':
+                    yield loc, lastmod, images
+                else:
+                    nested.append(loc)
+                loc = lastmod = None
+                images = 0
+                # Drop parsed entries so memory stays flat on large sitemaps
+                root.clear()
+
+    for child in nested:
+        yield from iter_sitemap(child, timeout)
+
+def category_pages(main_pages):
+    """Top-level category pages above the listing pages, e.g. womens.html for /womens/kurti.html."""
+    return {urlparse(page).path.strip('/').split('/')[0] + '.html' for page in main_pages}
+
+def is_product_url(url, excluded=()):
+    """
+    Product pages sit directly under the site root, sub-category pages are nested (e.g. /womens/kurti.html).
+
+    Top-level category pages (e.g. /womens.html) and CMS pages also sit under the root, so
+    `excluded` names the category pages, and the known CMS pages are always rejected.
+    """
+    path = urlparse(url).path.strip('/')
+    return path.endswith('.html') and '/' not in path and path not in CMS_PAGES and path not in excluded
+
+def sitemap_product_links(sitemap_url, since=None, main_pages=()):
+    """
+    Collect product links from the site's XML sitemap in one lightweight request.
+
+    Unlike the listing pages, this returns every product in the store: product URLs carry no
+    category, so main_pages only rules out category pages. If the sitemap lists images, entries
+    without any are skipped as category or CMS pages.
+
+    :param sitemap_url: URL of the sitemap or sitemap index.
+    :param since: Optional 'YYYY-MM-DD'; only products modified on or after it are returned.
+    :param main_pages: The configured listing pages, whose top-level categories are not products.
+    """
+    print(f"Reading sitemap: {sitemap_url}")
+    excluded = category_pages(main_pages)
+    links = {}
+    with_images = set()
+    for loc, lastmod, images in iter_sitemap(sitemap_url):
+        if not loc or not is_product_url(loc, excluded):
+            continue
+        if since and lastmod and lastmod[:10] < since:
+            continue
+        links[loc] = lastmod
+        if images:
+            with_images.add(loc)
+    if with_images:
+        links = {loc: lastmod for loc, lastmod in links.items() if loc in with_images}
+    print(f"Total product links in sitemap: {len(links)}")
+    return list(links)
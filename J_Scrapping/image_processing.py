@@ -1,13 +1,85 @@
 import os
+import json
+import urllib.request
+from types import SimpleNamespace
 from PIL import Image
 import torch
 from tqdm import tqdm
 from transformers import ViltProcessor, ViltForQuestionAnswering
+from profiling import profiled
+from color_extraction import COLOR_QUESTIONS, extract_colors, format_colors
 
-def image_processing(df, image_dir):
+VQA_MODEL_NAME = "dandelin/vilt-b32-finetuned-vqa"
+
+# Inference backends selectable through "vqa_backend" in config.json
+VQA_BACKENDS = ("fp32", "int8", "torchscript")
+
+# The traced graph is specialised to one input shape, so images and questions
+# are padded/resized to these before encoding when using the torchscript backend
+TRACE_IMAGE_SIZE = (480, 384)
+TRACE_MAX_QUESTION_LENGTH = 40
+
+# How product colours are found, selectable through "color_mode" in config.json:
+# "vqa" asks the colour questions, "pixel" replaces them with pixel clustering
+# and "both" does both
+COLOR_MODES = ("vqa", "pixel", "both")
+
+class TracedViltModel:
+    """Wrap a traced VILT graph so it can be used like the eager model."""
+
+    def __init__(self, traced, config):
+        self.traced = traced
+        self.config = config
+
+    def __call__(self, **encoding):
+        return SimpleNamespace(logits=traced_logits(self.traced(**encoding)))
+
+def traced_logits(outputs):
+    """Logits of a traced forward pass; depending on the transformers version it returns a tuple or a dict."""
+    if isinstance(outputs, dict):
+        return outputs['logits']
+    return outputs[0]
+
+class VqaWorkerClient:
+    """Client of a running vqa_worker.py, which keeps the model loaded across pipeline runs."""
+
+    def __init__(self, url, timeout=300):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def stats(self):
+        with urllib.request.urlopen(f"{self.url}/stats", timeout=2) as response:
+            return json.load(response)
+
+    def available(self):
+        try:
+            self.stats()
+            return True
+        except OSError:
+            return False
+
+    def answer(self, image_path, questions):
+        """Top 5 answers for each question about the image, in question order."""
+        body = json.dumps({'image_path': os.path.abspath(image_path), 'questions': questions}).encode('utf-8')
+        request = urllib.request.Request(f"{self.url}/answer", data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)['answers']
+
+def image_processing(df, image_dir, backend="fp32", color_mode="vqa", worker_url=None):
     """Perform image processing by dividing tasks into smaller functions."""
-    # Load model and processor
-    processor, model = load_model()
+    if color_mode not in COLOR_MODES:
+        raise ValueError(f"Unknown color mode '{color_mode}', expected one of {COLOR_MODES}")
+
+    # Use the long-lived worker if one is running, otherwise load model and processor here
+    worker = VqaWorkerClient(worker_url) if worker_url else None
+    if worker is not None and worker.available():
+        print(f"Using VQA worker at {worker_url} ({worker.stats()['backend']} backend)")
+        processor, model = None, None
+    else:
+        if worker is not None:
+            print(f"No VQA worker at {worker_url}, loading the model in-process.")
+        worker = None
+        processor, model = load_model(backend)
 
     # Convert the product code column to uppercase
     df['Code'] = df['Code'].str.upper()
@@ -16,33 +88,73 @@ def image_processing(df, image_dir):
     image_codes = extract_image_codes(image_dir)
 
     # Process DataFrame rows
-    df = process_rows(df, image_codes, image_dir, processor, model)
+    df = process_rows(df, image_codes, image_dir, processor, model, color_mode, worker)
 
     # Rename columns
     df = rename_columns(df)
 
     return df
 
-def load_model():
-    """Load the VILT model and processor."""
-    processor = ViltProcessor.from_pretrained("dandelin/vilt-b32-finetuned-vqa")
-    model = ViltForQuestionAnswering.from_pretrained("dandelin/vilt-b32-finetuned-vqa")
+def load_model(backend="fp32"):
+    """Load the VILT model and processor for the given inference backend."""
+    if backend not in VQA_BACKENDS:
+        raise ValueError(f"Unknown VQA backend '{backend}', expected one of {VQA_BACKENDS}")
+
+    processor = ViltProcessor.from_pretrained(VQA_MODEL_NAME)
+    model = ViltForQuestionAnswering.from_pretrained(VQA_MODEL_NAME, torchscript=(backend == "torchscript"))
+    model.eval()
+
+    if backend == "int8":
+        model = quantize_model(model)
+    elif backend == "torchscript":
+        model = trace_model(processor, model)
     return processor, model
 
+def quantize_model(model):
+    """Apply dynamic int8 quantization to the linear layers of the model."""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def trace_model(processor, model):
+    """Trace the model into a TorchScript graph using a fixed-shape example input."""
+    example_image = Image.new("RGB", TRACE_IMAGE_SIZE)
+    encoding = encode_inputs(example_image, "describe the shirt color", processor, traced=True)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example_kwarg_inputs=dict(encoding), strict=False)
+        traced = torch.jit.freeze(traced.eval())
+
+        # Fail at load time rather than answering every question with nothing
+        try:
+            logits = traced_logits(traced(**encoding))
+        except (KeyError, IndexError, TypeError) as e:
+            raise RuntimeError(f"Traced VQA model does not return logits: {type(e).__name__}: {e}") from e
+        if not isinstance(logits, torch.Tensor) or logits.shape != (1, len(model.config.id2label)):
+            raise RuntimeError(f"Traced VQA model returned unexpected logits: {logits!r:.200}")
+    return TracedViltModel(traced, model.config)
+
+def encode_inputs(image, question, processor, traced=False):
+    """Encode an image and question into model inputs."""
+    if traced:
+        image = image.convert("RGB").resize(TRACE_IMAGE_SIZE)
+        return processor(image, question, padding="max_length", truncation=True,
+                         max_length=TRACE_MAX_QUESTION_LENGTH, return_tensors="pt")
+    return processor(image, question, return_tensors="pt")
+
 def extract_image_codes(image_dir):
     """Extract codes from image filenames."""
     image_files = [f for f in os.listdir(image_dir) if f.endswith(('.jpg', '.jpeg', '.png'))]
     image_codes = {f.split('_')[0].upper(): f for f in image_files}  # Convert to uppercase for consistency
     return image_codes
 
+@profiled()
 def process_image_and_answer(image, question, processor, model):
     """Run inference on the image and return top 5 answers for the question."""
     try:
         # Prepare inputs
-        encoding = processor(image, question, return_tensors="pt")
+        encoding = encode_inputs(image, question, processor, traced=isinstance(model, TracedViltModel))
 
         # Forward pass
-        outputs = model(**encoding)
+        with torch.no_grad():
+            outputs = model(**encoding)
         logits = outputs.logits
 
         # Get all possible answers with their scores
@@ -58,7 +170,7 @@ def process_image_and_answer(image, question, processor, model):
         print(f"Error processing question '{question}': {e}")
         return []
 
-def process_rows(df, image_codes, image_dir, processor, model):
+def process_rows(df, image_codes, image_dir, processor, model, color_mode="vqa", worker=None):
     """Iterate through each row and process images based on the product category."""
     print("Processing images...")
     for index, row in tqdm(df.iterrows(), total=len(df), desc="Processing rows"):
@@ -72,13 +184,31 @@ def process_rows(df, image_codes, image_dir, processor, model):
         image = Image.open(img_path)
 
         questions = get_questions(product_category)
-        
-        for question in questions:
-            top_5_labels = process_image_and_answer(image, question, processor, model)
+        if color_mode == "pixel":
+            questions = [q for q in questions if q not in COLOR_QUESTIONS]
+
+        if color_mode in ("pixel", "both"):
+            df.at[index, 'Image Color'], df.at[index, 'Color Coverage'] = format_colors(extract_colors(image))
+
+        if worker is not None:
+            # One request per image, so the worker can batch all of its questions
+            answers = worker_answers(worker, img_path, questions)
+        else:
+            answers = [process_image_and_answer(image, question, processor, model) for question in questions]
+        for question, top_5_labels in zip(questions, answers):
             df.at[index, question] = ' '.join(top_5_labels)
     
     return df
 
+@profiled()
+def worker_answers(worker, img_path, questions):
+    """Answers from the VQA worker; empty answers on failure, like process_image_and_answer."""
+    try:
+        return worker.answer(img_path, questions)
+    except Exception as e:
+        print(f"Error asking VQA worker about '{img_path}': {e}")
+        return [[] for _ in questions]
+
 def rename_columns(df):
     """Rename columns in the DataFrame."""
     rename_map = {
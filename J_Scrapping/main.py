@@ -4,16 +4,18 @@ import sys
 import pandas as pd
 from selenium import webdriver
 from data_extracting import (
-    get_total_products,
-    get_pagination_links,
-    get_product_links,
     remove_existing_links,
+    stale_links,
     scrape_product_details,
+    scrape_products_scheduled,
     )
 from data_processing import data_processing
 from image_processing import image_processing
 from data_post_processing import post_processing
-from database import get_db_connection, create_table, load_data, add_fulltext_index
+from page_archive import PageArchive
+from discovery import discover_product_links, sitemap_product_links
+from profiling import PROFILER, stage
+from database import CatalogueReloadError, get_db_connection, merge_catalogue, reload_catalogue
 
 def load_config(config_file):
     """Load configuration from a JSON file."""
@@ -25,7 +27,7 @@ def append_or_create_csv(csv_file_path, new_data):
     """Append rows to an existing CSV file or create a new one if it doesn't exist."""
     if os.path.exists(csv_file_path):
         existing_data = pd.read_csv(csv_file_path)
-        combined_data = pd.concat([existing_data, new_data], ignore_index=True)
+        combined_data = merge_catalogue(existing_data, new_data)
         print(f"Appended data to existing CSV file at {csv_file_path}")
         combined_data.to_csv(csv_file_path, index=False)
     else:
@@ -41,27 +43,68 @@ if os.path.exists("new_products.csv"):
 # Load config
 config = load_config('config.json')
 
-driver = webdriver.Chrome()
+# Per-stage timings, written as a JSON run report at the end
+profiling_config = config.get("profiling", {})
+if profiling_config.get("enabled"):
+    PROFILER.configure(memory=profiling_config.get("memory", False),
+                       cprofile=profiling_config.get("cprofile", False),
+                       sampling=profiling_config.get("sampling", False),
+                       profile_dir=profiling_config.get("profile_dir", "Profiles"))
+
+def write_run_report():
+    """Write the run report and print its summary if profiling is enabled."""
+    if PROFILER.enabled:
+        report_path = profiling_config.get("report_path", "run_report.json")
+        PROFILER.write_report(report_path)
+        print(PROFILER.summary())
+        print(f"Run report written to {report_path}")
+
+# The sitemap lists every product in the store, not only those under main_pages; the others get
+# category 'other' and no VQA questions, so crawling them has to be asked for with sitemap_whole_store
+use_sitemap = config.get("discovery") == "sitemap"
+if use_sitemap and not config.get("sitemap_whole_store"):
+    print("Sitemap discovery covers the whole store; set sitemap_whole_store to use it. Reading main_pages instead.")
+    use_sitemap = False
+
+# One browser for listing discovery and unscheduled scraping; scheduled workers open their own
+driver = webdriver.Chrome() if not use_sitemap or not config.get("crawl_workers") else None
+
+# Archive of every fetched page, so extraction can be re-run offline with reextract.py
+archive = PageArchive(config["archive_dir"], config.get("refresh_after_days")) if config.get("archive_dir") else None
+
+# Discover product links, from the sitemap or by reading every listing page once
+with stage("discovery") as record:
+    if use_sitemap:
+        items_link = sitemap_product_links(config["sitemap_url"], config.get("sitemap_since"), config["main_pages"])
+    else:
+        items_link = []
+        for main_page in config["main_pages"]:
+            items_link.extend(discover_product_links(driver, main_page, config["products_per_page"], archive))
+    items_link = list(dict.fromkeys(items_link))
 
-all_products = []
+    # Known products whose archived page has gone stale are scraped again, after the new ones
+    refresh_links = []
+    if archive is not None and config.get("refresh_after_days") is not None:
+        refresh_links = stale_links(items_link, config["csv_file_path"], archive, config["refresh_after_days"])
 
-for main_page in config["main_pages"]:
-    total_products, is_paging = get_total_products(driver, main_page)
-    if is_paging:
-        page_urls = get_pagination_links(driver, main_page, total_products)
-    else:
-        page_urls = [main_page]
-    items_link = get_product_links(driver, page_urls)
-    
     # Remove existing links
     items_link = remove_existing_links(items_link, config["csv_file_path"])
-    
-    # Scrape product details
-    products = scrape_product_details(driver, items_link, config["image_save_dir"])
-    all_products.extend(products)
+    record.items = len(items_link) + len(refresh_links)
+
+# Scrape product details
+with stage("scraping") as record:
+    if config.get("crawl_workers"):
+        all_products = scrape_products_scheduled(webdriver.Chrome, items_link, config["image_save_dir"], archive,
+                                                 config["crawl_workers"], refresh_links, config.get("crawl_limits"))
+    else:
+        all_products = scrape_product_details(driver, items_link + refresh_links, config["image_save_dir"], archive)
+    record.items = len(all_products)
 
 # Close the driver
-driver.quit()
+if driver is not None:
+    driver.quit()
+if archive is not None:
+    archive.close()
 
 # Append or create CSV file
 
@@ -70,33 +113,44 @@ df_products = None
 try:
     df_products = pd.read_csv(config["new_csv_file_path"])
      # # Data processing
-    df_products_processed = data_processing(df_products)
+    with stage("data_processing") as record:
+        df_products_processed = data_processing(df_products)
+        record.items = len(df_products_processed)
     df_products_processed.to_csv(config["new_csv_file_path"], index=False)
 
     # Image processing
-    df_images_processed = image_processing(df_products_processed, config["image_save_dir"])
+    with stage("image_processing") as record:
+        worker = config.get("vqa_worker")
+        worker_url = f"http://{worker['host']}:{worker['port']}" if worker else None
+        df_images_processed = image_processing(df_products_processed, config["image_save_dir"], config.get("vqa_backend", "fp32"),
+                                               config.get("color_mode", "vqa"), worker_url)
+        record.items = len(df_images_processed)
     df_images_processed.to_csv(config["new_csv_file_path"], index=False)
 
     # Post processing
-    df_final = post_processing(df_images_processed)
+    with stage("post_processing") as record:
+        df_final = post_processing(df_images_processed)
+        record.items = len(df_final)
     df_final.to_csv(config["new_csv_file_path"], index=False)
 
     append_or_create_csv(config["csv_file_path"], df_final)
 
 
     # Database operations
-    connection = get_db_connection(config["db_host"], config["db_user"], config["db_password"], config["db_name"]) 
-    cursor = connection.cursor()
-
-    create_table(cursor, config["table_name"])
-    load_data(cursor, config["table_name"], df_final)
-    add_fulltext_index(cursor, config["table_name"])
-
-    connection.commit()
-    cursor.close()
-    connection.close()
-    print("Database operations completed successfully.")
+    with stage("database") as record:
+        connection = get_db_connection(config["db_host"], config["db_user"], config["db_password"], config["db_name"]) 
+        # Load the full catalogue into a shadow table and swap it in, so /search never sees a half-loaded table
+        df_catalogue = pd.read_csv(config["csv_file_path"])
+        try:
+            reload_catalogue(connection, config["table_name"], df_catalogue)
+            print("Database operations completed successfully.")
+        except CatalogueReloadError as e:
+            print(f"Catalogue reload aborted, live table left unchanged: {e}")
+        connection.close()
+        record.items = len(df_catalogue)
+    write_run_report()
 
 except pd.errors.EmptyDataError:
     print("The CSV file is empty, No new products found.")
+    write_run_report()
     sys.exit()
\ No newline at end of file
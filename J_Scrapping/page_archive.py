@@ -0,0 +1,259 @@
+import os
+import gzip
+import json
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta, timezone
+import lxml.html
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import NoSuchElementException
+
+USER_AGENT = "Mozilla/5.0 (compatible; DesiBazaarScraper/1.0)"
+
+ARCHIVE_FILE = "pages.warc.gz"
+INDEX_FILE = "pages.idx"
+
+# Elements that start a new line in rendered text, like Selenium's element.text
+BLOCK_TAGS = {'p', 'div', 'li', 'ul', 'ol', 'tr', 'table', 'tbody', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+              'section', 'article', 'header', 'footer', 'dl', 'dt', 'dd'}
+HIDDEN_TAGS = {'script', 'style', 'noscript', 'template'}
+
+class PageArchive:
+    """Append-only, gzip-compressed WARC-style archive of fetched pages with an offset index by URL."""
+
+    def __init__(self, archive_dir, max_age_days=None):
+        """
+        :param max_age_days: Product pages fetched or revalidated more recently than this are reused
+            without asking the site; None revalidates every time.
+        """
+        self.max_age_days = max_age_days
+        os.makedirs(archive_dir, exist_ok=True)
+        self.archive_path = os.path.join(archive_dir, ARCHIVE_FILE)
+        self.index_path = os.path.join(archive_dir, INDEX_FILE)
+        self.index = load_index(self.index_path)
+        self._writer = None
+        self._reader = None
+        # Scheduler workers share one archive
+        self._lock = threading.Lock()
+
+    def __contains__(self, url):
+        return url in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def urls(self, kind=None):
+        """Return the archived URLs, optionally only those of one kind ('listing' or 'product')."""
+        return [url for url, entry in self.index.items() if kind is None or entry['kind'] == kind]
+
+    def stale_urls(self, max_age_days, kind=None):
+        """Return the archived URLs, optionally of one kind, last fetched or revalidated more than max_age_days ago."""
+        return [url for url in self.urls(kind) if checked_date(self.index[url]) < cutoff(max_age_days)]
+
+    def store(self, url, html, kind, etag=None, last_modified=None):
+        """Append a page to the archive and index its offset."""
+        body = html.encode('utf-8')
+        date = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        headers = [
+            "WARC/1.0",
+            "WARC-Type: response",
+            f"WARC-Target-URI: {url}",
+            f"WARC-Date: {date}",
+            "Content-Type: text/html; charset=utf-8",
+            f"Content-Length: {len(body)}",
+        ]
+        record = ('\r\n'.join(headers) + '\r\n\r\n').encode('utf-8') + body + b'\r\n\r\n'
+
+        # Every record is its own gzip member so it can be read back from its offset alone
+        compressed = gzip.compress(record)
+        with self._lock:
+            if self._writer is None:
+                self._writer = open(self.archive_path, 'ab')
+            offset = self._writer.seek(0, os.SEEK_END)
+            self._writer.write(compressed)
+            self._writer.flush()
+
+            entry = {'url': url, 'kind': kind, 'offset': offset, 'length': len(compressed),
+                     'date': date, 'etag': etag, 'last_modified': last_modified}
+            self._append_index(entry)
+
+    def mark_checked(self, url):
+        """Record that the archived copy of a URL was revalidated as current."""
+        with self._lock:
+            entry = dict(self.index[url], checked=datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'))
+            self._append_index(entry)
+
+    def _append_index(self, entry):
+        # Later index entries for a URL replace earlier ones, so an update is another line
+        with open(self.index_path, 'a') as file:
+            file.write(json.dumps(entry) + '\n')
+        self.index[entry['url']] = entry
+
+    def read(self, url):
+        """Return the latest archived HTML for a URL."""
+        with self._lock:
+            entry = self.index[url]
+            if self._reader is None:
+                self._reader = open(self.archive_path, 'rb')
+            self._reader.seek(entry['offset'])
+            compressed = self._reader.read(entry['length'])
+        record = gzip.decompress(compressed)
+        _, body = record.split(b'\r\n\r\n', 1)
+        return body[:-4].decode('utf-8')
+
+    def load_if_unchanged(self, url):
+        """Return the archived page if it is recent or a conditional GET says it has not changed, else None."""
+        entry = self.index.get(url)
+        if entry is None:
+            return None
+        # Listings gain new products at any time, so only product pages are reused unchecked
+        if (entry['kind'] == 'product' and self.max_age_days is not None
+                and checked_date(entry) >= cutoff(self.max_age_days)):
+            return HtmlPage(self.read(url), url)
+        if not (entry['etag'] or entry['last_modified']):
+            return None
+        try:
+            status, _, _ = conditional_get(url, entry['etag'], entry['last_modified'])
+        except (urllib.error.URLError, OSError):
+            return None
+        if status != 304:
+            return None
+        self.mark_checked(url)
+        return HtmlPage(self.read(url), url)
+
+    def close(self):
+        for file in (self._writer, self._reader):
+            if file is not None:
+                file.close()
+        self._writer = self._reader = None
+
+def load_index(index_path):
+    """Load the URL index; later entries for the same URL replace earlier ones."""
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path) as file:
+            for line in file:
+                if line.strip():
+                    entry = json.loads(line)
+                    index[entry['url']] = entry
+    return index
+
+def cutoff(max_age_days):
+    """Index date of max_age_days ago."""
+    return (datetime.now(timezone.utc) - timedelta(days=max_age_days)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def checked_date(entry):
+    """When an index entry was last known to be current: its last revalidation, or when it was stored."""
+    return entry.get('checked') or entry['date']
+
+def conditional_get(url, etag=None, last_modified=None, method='GET', timeout=30):
+    """Send a (conditional) request and return the status and the page validators."""
+    headers = {'User-Agent': USER_AGENT}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    request = urllib.request.Request(url, headers=headers, method=method)
+    try:
+        # The body is never read, so an unchanged check costs little more than the headers
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.headers.get('ETag'), response.headers.get('Last-Modified')
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, etag, last_modified
+        raise
+
+def load_page(driver, url, archive=None):
+    """Load a page in the browser unless the archived copy is still current."""
+    if archive is not None:
+        page = archive.load_if_unchanged(url)
+        if page is not None:
+            return page
+    driver.get(url)
+    return driver
+
+def archive_page(archive, page, url, kind, on_error=None):
+    """
+    Store a page rendered by the browser in the archive along with its validators.
+
+    A failed validator request stores the page without them, after calling on_error(url, error) if given.
+    """
+    if archive is None or isinstance(page, HtmlPage):
+        return
+    try:
+        _, etag, last_modified = conditional_get(url, method='HEAD')
+    except (urllib.error.URLError, OSError) as e:
+        if on_error is not None:
+            on_error(url, e)
+        etag = last_modified = None
+    archive.store(url, page.page_source, kind, etag, last_modified)
+
+def element_text(node):
+    """Return the rendered text of an element, keeping line breaks between blocks."""
+    parts = []
+    collect_text(node, parts)
+    lines = (' '.join(line.split()) for line in ''.join(parts).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+def collect_text(node, parts):
+    tag = node.tag if isinstance(node.tag, str) else None
+    if tag is None or tag in HIDDEN_TAGS:
+        return
+    if tag == 'br' or tag in BLOCK_TAGS:
+        parts.append('\n')
+    if node.text:
+        parts.append(node.text)
+    for child in node:
+        collect_text(child, parts)
+        if child.tail:
+            parts.append(child.tail)
+    if tag in BLOCK_TAGS:
+        parts.append('\n')
+
+def to_xpath(by, value):
+    """Translate a Selenium locator into an XPath expression."""
+    if by == By.ID:
+        return f".//*[@id='{value}']"
+    if by == By.CLASS_NAME:
+        return f".//*[contains(concat(' ', normalize-space(@class), ' '), ' {value} ')]"
+    if by == By.TAG_NAME:
+        return f".//{value}"
+    if by == By.XPATH:
+        return value
+    raise ValueError(f"Unsupported locator for archived pages: {by}")
+
+class HtmlElement:
+    """Minimal stand-in for a Selenium WebElement backed by parsed HTML."""
+
+    def __init__(self, node):
+        self.node = node
+
+    @property
+    def text(self):
+        return element_text(self.node)
+
+    def get_attribute(self, name):
+        if name in ('innerText', 'textContent'):
+            return element_text(self.node)
+        return self.node.get(name)
+
+    def find_elements(self, by=By.ID, value=None):
+        return [HtmlElement(node) for node in self.node.xpath(to_xpath(by, value))]
+
+    def find_element(self, by=By.ID, value=None):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f"No element found for {by}={value}")
+        return elements[0]
+
+class HtmlPage(HtmlElement):
+    """Minimal stand-in for a Selenium driver positioned on an archived page."""
+
+    def __init__(self, html, url):
+        document = lxml.html.fromstring(html, base_url=url)
+        # Selenium returns absolute href/src values
+        document.make_links_absolute(url)
+        super().__init__(document)
+        self.current_url = url
+        self.page_source = html
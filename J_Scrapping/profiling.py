@@ -0,0 +1,228 @@
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+class StageRecord:
+    """Measurements of one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = None
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_memory_mb = None
+        self.top_functions = None
+        self.top_samples = None
+
+    def to_dict(self):
+        record = {
+            'name': self.name,
+            'wall_seconds': round(self.wall_seconds, 4),
+            'cpu_seconds': round(self.cpu_seconds, 4),
+            'items': self.items,
+            'items_per_second': round(self.items / self.wall_seconds, 3) if self.items and self.wall_seconds else None,
+            'peak_memory_mb': self.peak_memory_mb,
+        }
+        if self.top_functions is not None:
+            record['top_functions'] = self.top_functions
+        if self.top_samples is not None:
+            record['top_samples'] = self.top_samples
+        return record
+
+class Sampler(threading.Thread):
+    """Sampling profiler: periodically records the Python stack of every other thread."""
+
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def top(self, limit=15):
+        """Functions most often on top of the stack, with their share of the samples."""
+        total = sum(self.stacks.values())
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return [{'function': leaf, 'samples': count, 'percent': round(100 * count / total, 1)}
+                for leaf, count in leaves.most_common(limit)]
+
+    def write_folded(self, path):
+        """Write the stacks in the folded format read by flamegraph tools."""
+        with open(path, 'w') as file:
+            for stack, count in self.stacks.items():
+                file.write(f"{stack} {count}\n")
+
+class Profiler:
+    """Collects per-stage and per-function timings for a pipeline run."""
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.cprofile = False
+        self.sampling = False
+        self.sample_interval = 0.005
+        self.profile_dir = "Profiles"
+        self.started = None
+        self.stages = []
+        self.functions = {}     # name -> [calls, wall seconds, cpu seconds]
+        self._lock = threading.Lock()
+
+    def configure(self, enabled=True, memory=False, cprofile=False, sampling=False,
+                  sample_interval=0.005, profile_dir="Profiles"):
+        """
+        Switch instrumentation on. Timers are always on when enabled; the rest is opt-in.
+
+        :param memory: Track peak memory per stage with tracemalloc (slows allocation-heavy code).
+        :param cprofile: Capture a cProfile of each stage's main thread into profile_dir.
+        :param sampling: Run a sampling profiler over all threads during each stage.
+        """
+        self.enabled = enabled
+        self.memory = memory
+        self.cprofile = cprofile
+        self.sampling = sampling
+        self.sample_interval = sample_interval
+        self.profile_dir = profile_dir
+        self.started = time.time()
+        if enabled and memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if enabled and (cprofile or sampling):
+            os.makedirs(profile_dir, exist_ok=True)
+
+    @contextmanager
+    def stage(self, name):
+        """Measure a pipeline stage; set `items` on the yielded record to get a throughput."""
+        record = StageRecord(name)
+        if not self.enabled:
+            yield record
+            return
+
+        if self.memory:
+            tracemalloc.reset_peak()
+        profile = cProfile.Profile() if self.cprofile else None
+        sampler = Sampler(self.sample_interval) if self.sampling else None
+        if profile is not None:
+            profile.enable()
+        if sampler is not None:
+            sampler.start()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record.wall_seconds = time.perf_counter() - wall_start
+            record.cpu_seconds = time.process_time() - cpu_start
+            if self.memory:
+                record.peak_memory_mb = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(os.path.join(self.profile_dir, f"{name}.prof"))
+                record.top_functions = top_cumulative(profile)
+            if sampler is not None:
+                sampler.stop()
+                sampler.write_folded(os.path.join(self.profile_dir, f"{name}.folded"))
+                record.top_samples = sampler.top()
+            with self._lock:
+                self.stages.append(record)
+
+    def profiled(self, name=None):
+        """Decorator counting calls and time of a hot function; a single flag check when disabled."""
+        def decorator(func):
+            label = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                wall_start, cpu_start = time.perf_counter(), time.thread_time()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._record_call(label, time.perf_counter() - wall_start, time.thread_time() - cpu_start)
+            return wrapper
+        return decorator
+
+    def _record_call(self, name, wall, cpu):
+        with self._lock:
+            totals = self.functions.setdefault(name, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += wall
+            totals[2] += cpu
+
+    def report(self):
+        """The run report as a JSON-serialisable dict."""
+        functions = {}
+        for name, (calls, wall, cpu) in sorted(self.functions.items(), key=lambda x: x[1][1], reverse=True):
+            functions[name] = {
+                'calls': calls,
+                'wall_seconds': round(wall, 4),
+                'cpu_seconds': round(cpu, 4),
+                'mean_ms': round(1000 * wall / calls, 3),
+                'calls_per_second': round(calls / wall, 3) if wall else None,
+            }
+        return {
+            'started': datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec='seconds') if self.started else None,
+            'total_seconds': round(sum(stage.wall_seconds for stage in self.stages), 4),
+            'stages': [stage.to_dict() for stage in self.stages],
+            'functions': functions,
+        }
+
+    def write_report(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=4)
+
+    def summary(self):
+        """Human readable summary of the run."""
+        report = self.report()
+        total = report['total_seconds'] or 1
+        lines = [f"{'stage':<20}{'wall s':>10}{'cpu s':>10}{'share':>8}{'items':>8}{'items/s':>10}{'peak MB':>9}"]
+        for stage in report['stages']:
+            lines.append(f"{stage['name']:<20}{stage['wall_seconds']:>10.2f}{stage['cpu_seconds']:>10.2f}"
+                         f"{stage['wall_seconds'] / total:>8.1%}{stage['items'] if stage['items'] is not None else '-':>8}"
+                         f"{stage['items_per_second'] or '-':>10}{stage['peak_memory_mb'] or '-':>9}")
+        if report['functions']:
+            lines.append("")
+            lines.append(f"{'function':<28}{'calls':>8}{'wall s':>10}{'cpu s':>10}{'mean ms':>10}")
+            for name, function in report['functions'].items():
+                lines.append(f"{name:<28}{function['calls']:>8}{function['wall_seconds']:>10.2f}"
+                             f"{function['cpu_seconds']:>10.2f}{function['mean_ms']:>10.2f}")
+        return '\n'.join(lines)
+
+def top_cumulative(profile, limit=15):
+    """The functions with the highest cumulative time in a cProfile capture."""
+    stats = pstats.Stats(profile)
+    top = []
+    for func, (_, calls, _, cumulative, _) in sorted(stats.stats.items(), key=lambda x: x[1][3], reverse=True)[:limit]:
+        filename, line, function = func
+        top.append({'function': f"{os.path.basename(filename)}:{line}:{function}", 'calls': calls,
+                    'cumulative_seconds': round(cumulative, 4)})
+    return top
+
+# Shared profiler for the pipeline modules
+PROFILER = Profiler()
+stage = PROFILER.stage
+profiled = PROFILER.profiled
@@ -0,0 +1,63 @@
+import os
+import json
+import argparse
+from multiprocessing import Pool
+import pandas as pd
+from tqdm import tqdm
+from selenium.webdriver.support.ui import WebDriverWait
+from page_archive import PageArchive, HtmlPage
+from data_extracting import extract_product, handle_scrape_errors
+from data_processing import data_processing
+
+# Archive opened once per worker process
+_archive = None
+
+def init_worker(archive_dir):
+    global _archive
+    _archive = PageArchive(archive_dir)
+
+def reextract_product(link):
+    """Extract one product from its archived page, without any network access."""
+    try:
+        page = HtmlPage(_archive.read(link), link)
+        product, _ = extract_product(page, WebDriverWait(page, 0), link)
+        return product, None
+    except Exception as e:
+        return None, (link, str(e))
+
+def reextract(archive_dir, workers):
+    """Rebuild the scraped product records from every archived product page."""
+    archive = PageArchive(archive_dir)
+    links = archive.urls('product')
+    archive.close()
+    print(f"Re-extracting {len(links)} archived product pages with {workers} workers...")
+
+    with Pool(workers, initializer=init_worker, initargs=(archive_dir,)) as pool:
+        results = list(tqdm(pool.imap(reextract_product, links, chunksize=16), total=len(links), desc="Re-extracting"))
+
+    products = [product for product, _ in results if product is not None]
+    handle_scrape_errors([], [error for _, error in results if error is not None])
+    print(f"Total products re-extracted: {len(products)}")
+    return products
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the product dataset from the page archive.")
+    parser.add_argument('--config', default="config.json")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--raw-output', default="reextracted_raw.csv", help="CSV with the extracted product records.")
+    parser.add_argument('--output', default="reextracted_products.csv", help="CSV after data processing.")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as file:
+        config = json.load(file)
+
+    products = reextract(config["archive_dir"], args.workers)
+
+    # Round-trip through CSV so the columns look exactly like a scraped run
+    pd.DataFrame(products).to_csv(args.raw_output, index=False)
+    df_products = pd.read_csv(args.raw_output)
+    data_processing(df_products).to_csv(args.output, index=False)
+    print(f"Processed products written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+import json
+import argparse
+from database import get_db_connection, rollback_catalogue
+
+def main():
+    parser = argparse.ArgumentParser(description="Swap the previous catalogue version back into the live table.")
+    parser.add_argument('--config', default="config.json")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as file:
+        config = json.load(file)
+
+    connection = get_db_connection(config["db_host"], config["db_user"], config["db_password"], config["db_name"])
+    try:
+        rollback_catalogue(connection, config["table_name"])
+    finally:
+        connection.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import time
+import random
+import hashlib
+import mimetypes
+import threading
+from collections import Counter
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class StandInServer:
+    """Local HTTP server standing in for the shop, with injectable latency and errors."""
+
+    def __init__(self, pages=None, latency=0.0, jitter=0.0, error_rate=0.0, port=0, seed=0):
+        """
+        :param pages: Mapping of request path to HTML (str) or file content (bytes);
+            unknown paths get a generated page. Paths are matched with, then without, the query string.
+        :param latency: Seconds every response is delayed by.
+        :param jitter: Maximum extra random delay in seconds.
+        :param error_rate: Fraction of requests answered with 503 Service Unavailable.
+        """
+        self.pages = pages or {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.port = port
+        self.requests = 0
+        self.errors = 0
+        self.not_modified = 0
+        self.counts = Counter()     # requests by method and page/file, e.g. 'HEAD page', 'GET file'
+        self.last_modified = formatdate(usegmt=True)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def set_conditions(self, latency=None, jitter=None, error_rate=None):
+        """Change latency or error injection while the server is running."""
+        with self._lock:
+            if latency is not None:
+                self.latency = latency
+            if jitter is not None:
+                self.jitter = jitter
+            if error_rate is not None:
+                self.error_rate = error_rate
+
+    def page(self, path):
+        for key in (path, path.split('?')[0]):
+            if key in self.pages:
+                return self.pages[key]
+        return f"<html><head><title>{path}</title></head><body><h1>{path}</h1></body></html>"
+
+    def start(self):
+        """Start serving in a background thread and return the base URL."""
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                self.respond(send_body=False)
+
+            def do_GET(self):
+                self.respond(send_body=True)
+
+            def respond(self, send_body):
+                with stand_in._lock:
+                    stand_in.requests += 1
+                    is_page = not isinstance(stand_in.page(self.path.split('#')[0]), bytes)
+                    stand_in.counts[f"{self.command} {'page' if is_page else 'file'}"] += 1
+                    delay = stand_in.latency + stand_in._random.uniform(0, stand_in.jitter)
+                    failed = stand_in._random.random() < stand_in.error_rate
+                    if failed:
+                        stand_in.errors += 1
+                time.sleep(delay)
+
+                if failed:
+                    self.send_response(503)
+                    self.send_header('Retry-After', '1')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                path = self.path.split('#')[0]
+                body = stand_in.page(path)
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                    content_type = 'text/html; charset=utf-8'
+                else:
+                    content_type = mimetypes.guess_type(path.split('?')[0])[0] or 'application/octet-stream'
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    with stand_in._lock:
+                        stand_in.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', stand_in.last_modified)
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return f"http://127.0.0.1:{self.port}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,182 @@
+import io
+import os
+import math
+import random
+from html import escape
+from PIL import Image, ImageDraw
+
+# Product categories as they appear in the 'Product Category' field, with code prefix and piece count
+CATEGORIES = {
+    'Unstitched 1 Piece': ('JLAWN-S', 1),
+    'Unstitched 2 Piece - Shirt and Dupatta': ('JLAWN-S-JDS', 2),
+    'Unstitched 2 Piece - Shirt and Trouser': ('JLAWN-S-JST', 2),
+    'Unstitched 3 Piece': ('JLAWN-S', 3),
+    'Ladies Kurti': ('JLK', 1),
+    '2 Piece Stitched': ('JST', 2),
+    '3 Piece Stitched': ('JST', 3),
+}
+COLORS = {
+    'Rust': (170, 70, 30), 'Black': (20, 20, 20), 'Blue': (40, 90, 190), 'Pink': (235, 140, 170),
+    'White': (245, 245, 245), 'Green': (50, 140, 70), 'Maroon': (120, 20, 40), 'Mustard': (210, 170, 40),
+    'Beige': (215, 195, 160), 'Purple': (120, 60, 150),
+}
+FABRICS = ['Lawn', 'Cotton', 'Jacquard', 'Khaddar', 'Chiffon', 'Cambric', 'Karandi', 'Silk']
+COLLECTIONS = ['Spring Summer Collection', 'Festive Collection', 'Winter Collection', 'Eid Collection']
+SEASONS = ['Summer', 'Winter', 'Spring']
+NECKLINES = ['Round', 'V Neck', 'Collar', 'Boat Neck']
+SLEEVES = ['Full Sleeves', 'Three Quarter Sleeves', 'Short Sleeves', 'Sleeveless']
+EMBELLISHMENTS = ['Embroidered', 'Printed', 'Plain', 'Sequins']
+PATTERNS = ['Floral', 'Striped', 'Solid', 'Paisley', 'Geometric']
+
+class SyntheticCatalogue:
+    """Deterministic fake catalogue imitating the shop's pages, scraped records and processed CSV rows."""
+
+    def __init__(self, num_products=200, products_per_page=36, images_per_product=2,
+                 base_url="http://127.0.0.1", seed=0):
+        self.products_per_page = products_per_page
+        self.images_per_product = images_per_product
+        self.base_url = base_url.rstrip('/')
+        self.category_path = "/womens/synthetic.html"
+        self._random = random.Random(seed)
+        self.products = [self._make_product(index) for index in range(num_products)]
+
+    @property
+    def category_url(self):
+        return self.base_url + self.category_path
+
+    def _make_product(self, index):
+        r = self._random
+        category = r.choice(list(CATEGORIES))
+        prefix, pieces = CATEGORIES[category]
+        color = r.choice(list(COLORS))
+        fabric = r.choice(FABRICS)
+        code = f"{prefix}-{r.choice([23, 24])}-{index:04d}"
+        short_category = category.split(' - ')[0].replace(' Piece', 'PC')
+        name = f"{color} {fabric} {short_category}"
+        slug = f"{name}-{code}".lower().replace(' ', '-')
+
+        description = [
+            f"Fabric Type: {fabric}",
+            f"Collection: {r.choice(COLLECTIONS)}",
+            f"Shirt Front: {r.choice(EMBELLISHMENTS)} {fabric} Shirt",
+            f"Neckline: {r.choice(NECKLINES)}",
+            f"Sleeves: {r.choice(SLEEVES)}",
+            f"Embellishment: {r.choice(EMBELLISHMENTS)}",
+        ]
+        design = f"{r.choice(PATTERNS)} Shirt"
+        if pieces >= 2:
+            description.append(f"Trouser: Dyed {r.choice(FABRICS)} Trouser")
+            design += f" with {r.choice(FABRICS)} Trouser"
+        if pieces == 3 or 'Dupatta' in category:
+            description.append(f"Dupatta Length: {r.choice(['2.5', '2.25', '2.75'])} Meters")
+            design = f"{r.choice(PATTERNS)} Shirt with {r.choice(FABRICS)} Dupatta"
+
+        return {
+            'Name': name,
+            'Code': code,
+            'Link': f"{self.base_url}/{slug}.html",
+            'Price': f"PKR {r.randrange(200, 1500) * 10:,}.00",
+            'Description': '\n'.join(description),
+            'More info': [
+                f"Product Category: {category}",
+                f"Color: {color}",
+                f"Season: {r.choice(SEASONS)}",
+                f"Size: {pieces} Piece",
+                f"Design: {design}",
+            ],
+        }
+
+    def listing_urls(self):
+        max_page = max(1, math.ceil(len(self.products) / self.products_per_page))
+        return [self.category_url] + [f"{self.category_url}?p={page}" for page in range(2, max_page + 1)]
+
+    def listing_page(self, page_number):
+        """HTML of one listing page, with the toolbar, pager and product grid the scraper reads."""
+        total = len(self.products)
+        start = (page_number - 1) * self.products_per_page
+        products = self.products[start:start + self.products_per_page]
+        if total > self.products_per_page:
+            amount = (f'<p id="toolbar-amount"><span id="paging-label">Items</span> '
+                      f'{start + 1}-{start + len(products)} of {total}</p>')
+        else:
+            amount = f'<p id="toolbar-amount">{total} Items</p>'
+        pager = ''.join(f'<li class="item"><a class="page" href="{escape(url)}">{index + 1}</a></li>'
+                        for index, url in enumerate(self.listing_urls()))
+        items = ''.join(f'<li class="item product product-item"><a class="product-item-link" '
+                        f'href="{escape(p["Link"])}">{escape(p["Name"])}</a></li>' for p in products)
+        return (f'<html><body><div class="toolbar">{amount}</div>'
+                f'<ol class="products list items product-items">{items}</ol>'
+                f'<ul class="items pages-items">{pager}</ul></body></html>')
+
+    def image_urls(self, product):
+        return [f"{self.base_url}/media/{product['Code']}_{index + 1}.jpg?width=200&height=156"
+                for index in range(self.images_per_product)]
+
+    def product_page(self, product):
+        """HTML of one product page, with the elements the scraper's extraction functions read."""
+        description = '<br>'.join(escape(line) for line in product['Description'].split('\n'))
+        specs = [info.split(': ', 1) for info in product['More info']] + [['Disclaimer', 'Colours may vary']]
+        rows = ''.join(f'<tr><th class="col label">{escape(key)}</th><td class="col data">{escape(value)}</td></tr>'
+                       for key, value in specs)
+        images = ''.join(f'<a href="#"><img src="{escape(src)}"></a>' for src in self.image_urls(product))
+        return (f'<html><body><h1 class="page-title"><span class="base">'
+                f'{escape(product["Name"])} | {escape(product["Code"])}</span></h1>'
+                f'<div class="price-box"><span class="price">{escape(product["Price"])}</span></div>'
+                f'<div class="value" itemprop="description">{description}</div>'
+                f'<table id="product-attribute-specs-table"><tbody>{rows}</tbody></table>'
+                f'<div class="MagicToolboxSelectorsContainer">{images}</div></body></html>')
+
+    def image(self, product, size=(200, 156)):
+        """JPEG bytes of a product photo: the garment colour on a light studio background."""
+        color = COLORS[product['More info'][1].split(': ', 1)[1]]
+        image = Image.new("RGB", size, (235, 235, 235))
+        draw = ImageDraw.Draw(image)
+        width, height = size
+        draw.rectangle([width // 4, height // 8, 3 * width // 4, 7 * height // 8], fill=color)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+        return buffer.getvalue()
+
+    def pages(self):
+        """Map of request path to response body for serving the catalogue locally."""
+        pages = {}
+        for page_number, url in enumerate(self.listing_urls(), start=1):
+            pages[url[len(self.base_url):]] = self.listing_page(page_number)
+        for product in self.products:
+            pages[product['Link'][len(self.base_url):]] = self.product_page(product)
+            photo = self.image(product)
+            for index in range(self.images_per_product):
+                pages[f"/media/{product['Code']}_{index + 1}.jpg"] = photo
+        return pages
+
+    def write_images(self, image_dir):
+        """Save the product photos the way the scraper names downloaded images."""
+        os.makedirs(image_dir, exist_ok=True)
+        for product in self.products:
+            photo = self.image(product)
+            for index in range(self.images_per_product):
+                with open(os.path.join(image_dir, f"{product['Code']}_{index + 1}.jpg"), 'wb') as file:
+                    file.write(photo)
+
+    def final_rows(self):
+        """Rows shaped like junaid_jamshed.csv after post-processing."""
+        rows = []
+        for product in self.products:
+            info = dict(item.split(': ', 1) for item in product['More info'])
+            features = dict(line.split(': ', 1) for line in product['Description'].split('\n'))
+            rows.append({
+                'link': product['Link'],
+                'price': product['Price'].lower().replace(',', ' '),
+                'code': product['Code'],
+                'Fabric Type': features['Fabric Type'].lower(),
+                'Neckline': features['Neckline'].lower(),
+                'Collection': f"{features['Collection']} {info['Product Category']}".lower(),
+                'Trouser': features.get('Trouser', '').lower(),
+                'Sleeves': features['Sleeves'].lower(),
+                'Embellishment': features['Embellishment'].lower(),
+                'Color': info['Color'].lower(),
+                'Size': info['Size'].lower(),
+                'Shirt': features['Shirt Front'].lower(),
+                'Dupatta': info['Design'].lower() if 'Dupatta' in info['Design'] else '',
+            })
+        return rows
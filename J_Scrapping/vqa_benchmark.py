@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import time
+import argparse
+from PIL import Image
+from tqdm import tqdm
+from color_extraction import COLOR_QUESTIONS, extract_colors
+from image_processing import (
+    VQA_BACKENDS,
+    load_model,
+    extract_image_codes,
+    get_questions,
+    process_image_and_answer,
+)
+
+def run_backend(backend, image_paths, questions):
+    """Answer every question for every image and record answers and latencies."""
+    print(f"Loading model with backend: {backend}")
+    start = time.perf_counter()
+    processor, model = load_model(backend)
+    load_seconds = time.perf_counter() - start
+
+    # Warm up so one-off allocations are not counted in the latencies
+    with Image.open(image_paths[0]) as image:
+        process_image_and_answer(image, questions[0], processor, model)
+
+    answers = {}
+    latencies = []
+    for img_path in tqdm(image_paths, desc=f"Benchmarking {backend}"):
+        with Image.open(img_path) as image:
+            image.load()
+            for question in questions:
+                start = time.perf_counter()
+                answers[(img_path, question)] = process_image_and_answer(image, question, processor, model)
+                latencies.append(time.perf_counter() - start)
+
+    return load_seconds, latencies, answers
+
+def run_pixel_colors(image_paths):
+    """Time the pixel-based colour stage that can replace the VQA colour questions."""
+    latencies = []
+    for img_path in image_paths:
+        with Image.open(img_path) as image:
+            image.load()
+            start = time.perf_counter()
+            extract_colors(image)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+def summarize_latencies(load_seconds, latencies):
+    """Summarize latencies of one backend in milliseconds."""
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    return {
+        'load_seconds': round(load_seconds, 3),
+        'answers': len(ordered),
+        'mean_ms': round(1000 * total / len(ordered), 2),
+        'p50_ms': round(1000 * ordered[len(ordered) // 2], 2),
+        'p95_ms': round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        'answers_per_second': round(len(ordered) / total, 2),
+    }
+
+def compare_answers(reference, candidate):
+    """Compare top-5 answers of a backend against the fp32 reference answers."""
+    top1_matches = 0
+    overlaps = []
+    exact_matches = 0
+    for key, ref_labels in reference.items():
+        labels = candidate.get(key, [])
+        if ref_labels and labels and ref_labels[0] == labels[0]:
+            top1_matches += 1
+        if ref_labels == labels:
+            exact_matches += 1
+        overlaps.append(len(set(ref_labels) & set(labels)) / max(len(ref_labels), 1))
+
+    return {
+        'top1_agreement': round(top1_matches / len(reference), 4),
+        'top5_exact_agreement': round(exact_matches / len(reference), 4),
+        'mean_top5_overlap': round(sum(overlaps) / len(overlaps), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare VQA inference backends on the downloaded product images.")
+    parser.add_argument('--image-dir', default="Images", help="Directory with the product images.")
+    parser.add_argument('--backends', nargs='+', default=list(VQA_BACKENDS), choices=VQA_BACKENDS)
+    parser.add_argument('--limit', type=int, default=25, help="Number of images to benchmark.")
+    parser.add_argument('--output', default="vqa_benchmark.json", help="Where to write the JSON report.")
+    args = parser.parse_args()
+
+    image_codes = extract_image_codes(args.image_dir)
+    image_paths = [os.path.join(args.image_dir, f) for f in sorted(image_codes.values())][:args.limit]
+    if not image_paths:
+        print(f"No images found in {args.image_dir}")
+        sys.exit(1)
+
+    # Largest question set, so every question we ask in the pipeline is covered
+    questions = get_questions('3 piece stitched')
+
+    backends = ['fp32'] + [b for b in args.backends if b != 'fp32']
+    report = {'images': len(image_paths), 'questions': len(questions), 'backends': {}}
+    reference = None
+    for backend in backends:
+        load_seconds, latencies, answers = run_backend(backend, image_paths, questions)
+        result = summarize_latencies(load_seconds, latencies)
+        if reference is None:
+            reference = answers
+        else:
+            result['drift'] = compare_answers(reference, answers)
+            result['speedup'] = round(report['backends']['fp32']['mean_ms'] / result['mean_ms'], 2)
+        report['backends'][backend] = result
+
+    # Pixel colours run once per image while VQA asks each colour question separately
+    fp32_ms = report['backends']['fp32']['mean_ms']
+    color_ms = summarize_latencies(0, run_pixel_colors(image_paths))['mean_ms']
+    report['pixel_colors'] = {
+        'mean_ms_per_image': color_ms,
+        'vqa_ms_per_image': round(fp32_ms * len(COLOR_QUESTIONS), 2),
+    }
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=4)
+
+    print(f"\n{'backend':<12}{'load s':>8}{'mean ms':>10}{'p95 ms':>10}{'ans/s':>8}{'top1':>8}{'top5':>8}")
+    for backend, result in report['backends'].items():
+        drift = result.get('drift', {'top1_agreement': 1.0, 'mean_top5_overlap': 1.0})
+        print(f"{backend:<12}{result['load_seconds']:>8}{result['mean_ms']:>10}{result['p95_ms']:>10}"
+              f"{result['answers_per_second']:>8}{drift['top1_agreement']:>8}{drift['mean_top5_overlap']:>8}")
+    print(f"Pixel colours: {color_ms} ms/image vs {report['pixel_colors']['vqa_ms_per_image']} ms/image for VQA colour questions")
+    print(f"Report written to {args.output}")
+
+if __name__ == '__main__':
+    main()
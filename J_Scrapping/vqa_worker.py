@@ -0,0 +1,208 @@
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from PIL import Image
+import torch
+from image_processing import TracedViltModel, load_model, encode_inputs
+
+def collate(encodings):
+    """Stack single-item encodings into one batch, zero-padding text and images to the largest in the batch."""
+    batch = {}
+    for key in encodings[0].keys():
+        tensors = [encoding[key] for encoding in encodings]
+        shape = [max(tensor.shape[dim] for tensor in tensors) for dim in range(tensors[0].dim())]
+        padded = []
+        for tensor in tensors:
+            # F.pad takes (before, after) pairs starting from the last dimension
+            padding = []
+            for dim in reversed(range(1, tensor.dim())):
+                padding += [0, shape[dim] - tensor.shape[dim]]
+            padded.append(torch.nn.functional.pad(tensor, padding))
+        batch[key] = torch.cat(padded)
+    return batch
+
+def top_labels(logits, id2label, k=5):
+    """Top-k answer labels of every row of a batch of logits."""
+    indices = torch.topk(logits, k, dim=-1).indices.tolist()
+    return [[id2label[index] for index in row] for row in indices]
+
+class VqaWorker:
+    """
+    Answers VQA questions from a queue, running concurrent requests together as micro-batches.
+
+    Requests are encoded on the caller's thread; one inference thread waits for the first
+    queued question, then collects more for up to max_wait seconds or max_batch_size questions.
+    """
+
+    def __init__(self, processor, model, max_batch_size=16, max_wait=0.01, backend="fp32"):
+        self.processor = processor
+        self.model = model
+        self.backend = backend
+        self.traced = isinstance(model, TracedViltModel)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.started = time.time()
+        self.requests = 0
+        self.questions = 0
+        self.batches = 0
+        self.latencies = deque(maxlen=1000)      # seconds per request, most recent
+        self.batch_seconds = deque(maxlen=1000)  # seconds per forward pass, most recent
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def answer(self, image_path, questions):
+        """Top 5 answers for each question about the image at image_path, in question order."""
+        with Image.open(image_path) as image:
+            return self.answer_image(image, questions)
+
+    def answer_image(self, image, questions):
+        """Top 5 answers for each question about an open image, in question order."""
+        start = time.perf_counter()
+        futures = []
+        for question in questions:
+            future = Future()
+            self.queue.put((encode_inputs(image, question, self.processor, traced=self.traced), future))
+            futures.append(future)
+        answers = [future.result() for future in futures]
+        with self._lock:
+            self.requests += 1
+            self.questions += len(questions)
+            self.latencies.append(time.perf_counter() - start)
+        return answers
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._infer(batch)
+
+    def _infer(self, batch):
+        start = time.perf_counter()
+        try:
+            with torch.no_grad():
+                if self.traced:
+                    # The traced graph is specialised to batches of one
+                    logits = torch.cat([self.model(**encoding).logits for encoding, _ in batch])
+                else:
+                    logits = self.model(**collate([encoding for encoding, _ in batch])).logits
+            labels = top_labels(logits, self.model.config.id2label)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), answer in zip(batch, labels):
+            future.set_result(answer)
+        with self._lock:
+            self.batches += 1
+            self.batch_seconds.append(time.perf_counter() - start)
+
+    def stats(self):
+        """Queue depth, throughput and latency figures for the /stats endpoint."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            batch_seconds = list(self.batch_seconds)
+            stats = {
+                'backend': self.backend,
+                'uptime_seconds': round(time.time() - self.started, 1),
+                'queue_depth': self.queue.qsize(),
+                'requests': self.requests,
+                'questions': self.questions,
+                'batches': self.batches,
+                'mean_batch_size': round(self.questions / self.batches, 2) if self.batches else None,
+            }
+        if latencies:
+            stats['request_p50_ms'] = round(1000 * latencies[len(latencies) // 2], 2)
+            stats['request_p95_ms'] = round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+        if batch_seconds:
+            stats['batch_mean_ms'] = round(1000 * sum(batch_seconds) / len(batch_seconds), 2)
+        return stats
+
+def serve(worker, host="127.0.0.1", port=8765):
+    """
+    Serve a worker over local HTTP in a background thread and return the server.
+
+    POST /answer with {"image_path": ..., "questions": [...]} returns {"answers": [[label, ...], ...]};
+    GET /stats returns the worker's stats.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/stats':
+                self.respond(200, worker.stats())
+            else:
+                self.respond(404, {'error': f"unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != '/answer':
+                self.respond(404, {'error': f"unknown path {self.path}"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                answers = worker.answer(request['image_path'], request['questions'])
+            except (ValueError, KeyError, OSError) as e:
+                self.respond(400, {'error': f"{type(e).__name__}: {e}"})
+                return
+            except Exception as e:
+                self.respond(500, {'error': f"{type(e).__name__}: {e}"})
+                return
+            self.respond(200, {'answers': answers})
+
+        def respond(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the VQA model loaded and answer questions for pipeline runs.")
+    parser.add_argument('--config', default="config.json")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as file:
+        config = json.load(file)
+    options = config.get("vqa_worker", {})
+    backend = config.get("vqa_backend", "fp32")
+
+    print(f"Loading model with backend: {backend}")
+    processor, model = load_model(backend)
+    worker = VqaWorker(processor, model, options.get("max_batch_size", 16), options.get("max_wait_ms", 10) / 1000, backend)
+
+    # Warm up so the first real request does not pay for one-off allocations
+    worker.answer_image(Image.new("RGB", (384, 384)), ["describe the shirt color"])
+
+    host, port = options.get("host", "127.0.0.1"), options.get("port", 8765)
+    server = serve(worker, host, port)
+    print(f"VQA worker listening on http://{host}:{port}")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"VQA worker stats: {worker.stats()}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -17,7 +17,7 @@ if query:
     response = requests.get('http://127.0.0.1:5000/search', params={'query': query})
     
     if response.status_code == 200:
-        results = response.json()
+        results = response.json()['results']
         
         if results:
             st.write(f"### Top **{len(results)}** results:")
@@ -0,0 +1,80 @@
+import json
+import time
+import argparse
+import numpy as np
+from facets import FacetIndex, RoaringBitmap
+
+# Keyword pools per facet, shaped like post_processing output (single words joined by spaces);
+# later keywords are rarer
+SYNTHETIC_VALUES = {
+    'color': ['black', 'white', 'blue', 'pink', 'green', 'maroon', 'mustard', 'beige', 'purple', 'rust',
+              'gray', 'brown', 'yellow', 'red', 'orange', 'teal', 'peach', 'navy'],
+    'fabric_type': ['lawn', 'cotton', 'jacquard', 'khaddar', 'chiffon', 'cambric', 'karandi', 'silk', 'linen', 'velvet'],
+    'collection': ['festive', 'collection', 'winter', 'spring', 'summer', 'eid', 'unstitched', 'piece', 'stitched', 'kurti'],
+    'sleeves': ['solid', 'plain', 'floral', 'striped', 'plaid', 'full', 'short', 'three', 'quarter', 'sleeveless'],
+    'neckline': ['round', 'neck', 'collar', 'boat', 'striped', 'solid', 'plain', 'white'],
+    'embellishment': ['embroidered', 'printed', 'plain', 'sequins', 'tassel', 'button', 'front', 'slit'],
+}
+
+def synthetic_columns(num_products, seed=0):
+    """Random keyword-bag values for every facet: Zipf-like keyword frequencies, 1-3 keywords per product."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, pool in SYNTHETIC_VALUES.items():
+        weights = 1 / np.arange(1, len(pool) + 1)
+        # A few hundred distinct combinations, as in the real data
+        combinations = [' '.join(rng.choice(pool, size=rng.integers(1, 4), replace=False, p=weights / weights.sum()))
+                        for _ in range(300)]
+        columns[name] = [combinations[i] for i in rng.zipf(1.3, num_products) % len(combinations)]
+    # The search service builds the size facet from the typed piece count
+    columns['size'] = [(f"{pieces} piece",) for pieces in rng.choice([1, 2, 3], num_products, p=[0.2, 0.3, 0.5])]
+    return columns
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return {
+        'p50_ms': round(1000 * latencies[len(latencies) // 2], 3),
+        'p95_ms': round(1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark facet counts on a synthetic catalogue.")
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=50, help="Matched sets per scenario.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default="facet_benchmark.json")
+    args = parser.parse_args()
+
+    columns = synthetic_columns(args.products, args.seed)
+    start = time.perf_counter()
+    index = FacetIndex(np.arange(args.products), columns)
+    build_seconds = time.perf_counter() - start
+    print(f"Facet index for {args.products} products built in {build_seconds:.2f} s")
+
+    rng = np.random.default_rng(args.seed)
+    scenarios = {
+        'all_products': (1.0, {}),
+        'matched_10_percent': (0.1, {}),
+        'matched_1_percent': (0.01, {}),
+        'matched_10_percent_two_facets': (0.1, {'color': ['black', 'blue'], 'size': ['3 piece']}),
+    }
+    report = {'products': args.products, 'build_seconds': round(build_seconds, 3), 'scenarios': {}}
+    for name, (fraction, selected) in scenarios.items():
+        latencies = []
+        for _ in range(args.queries):
+            if fraction == 1.0:
+                matched = index.all_docs
+            else:
+                matched = RoaringBitmap.from_ids(rng.choice(args.products, int(args.products * fraction), replace=False))
+            start = time.perf_counter()
+            index.counts(matched, selected)
+            latencies.append(time.perf_counter() - start)
+        report['scenarios'][name] = percentiles(latencies)
+        print(f"{name:<32}{report['scenarios'][name]}")
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=4)
+    print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
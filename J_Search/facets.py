@@ -0,0 +1,266 @@
+import re
+import numpy as np
+
+# Processed attribute columns offered as facets, keyed by their query parameter name
+FACET_COLUMNS = {
+    'color': 'Color',
+    'fabric_type': 'Fabric Type',
+    'collection': 'Collection',
+    'sleeves': 'Sleeves',
+    'neckline': 'Neckline',
+    'embellishment': 'Embellishment',
+    'trouser': 'Trouser',
+    'shirt': 'Shirt',
+    'dupatta': 'Dupatta',
+}
+
+# Keyword extraction drops the digits of the Size text, so the size facet comes from the typed piece count
+FACET_NAMES = list(FACET_COLUMNS) + ['size']
+
+# Like Roaring: ids are split into chunks of 65536 by their high 16 bits, and a chunk
+# with more than ARRAY_MAX ids is stored as a bitset instead of a sorted array
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS
+ARRAY_MAX = 4096
+BITSET_WORDS = CHUNK_SIZE // 64
+
+def facet_values(value):
+    """
+    Facet values of one cell: the words of a processed attribute, or a list of ready-made values.
+
+    post_processing reduces attributes to single-word keywords joined by spaces (by commas before clean_cell).
+    """
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    if not isinstance(value, str):
+        return []
+    return list(dict.fromkeys(word for word in re.split(r"[\s,]+", value.lower()) if word and word != 'nan'))
+
+def to_bitset(low):
+    flags = np.zeros(CHUNK_SIZE, dtype=bool)
+    flags[low] = True
+    return np.packbits(flags, bitorder='little').view(np.uint64)
+
+def bitset_to_array(bits):
+    return np.flatnonzero(np.unpackbits(bits.view(np.uint8), bitorder='little')).astype(np.uint16)
+
+def bitset_contains(bits, low):
+    """Boolean mask of which of the 16-bit ids in `low` are set in `bits`."""
+    low = low.astype(np.uint64)
+    return ((bits[low >> np.uint64(6)] >> (low & np.uint64(63))) & np.uint64(1)).astype(bool)
+
+def make_container(low):
+    """Container for a sorted array of 16-bit ids."""
+    return to_bitset(low) if len(low) > ARRAY_MAX else low
+
+def cardinality(container):
+    if container.dtype == np.uint64:
+        return int(np.bitwise_count(container).sum())
+    return len(container)
+
+def and_containers(a, b):
+    if a.dtype == np.uint64 and b.dtype == np.uint64:
+        bits = a & b
+        return bits if cardinality(bits) > ARRAY_MAX else bitset_to_array(bits)
+    if a.dtype == np.uint64:
+        return b[bitset_contains(a, b)]
+    if b.dtype == np.uint64:
+        return a[bitset_contains(b, a)]
+    return np.intersect1d(a, b, assume_unique=True)
+
+def or_containers(a, b):
+    if a.dtype == np.uint64 or b.dtype == np.uint64:
+        bits = (a if a.dtype == np.uint64 else to_bitset(a)) | (b if b.dtype == np.uint64 else to_bitset(b))
+        return bits if cardinality(bits) > ARRAY_MAX else bitset_to_array(bits)
+    return make_container(np.union1d(a, b))
+
+class RoaringBitmap:
+    """Compressed set of document ids: sorted uint16 arrays for sparse chunks, bitsets for dense ones."""
+
+    def __init__(self, containers=None):
+        self.containers = containers or {}  # chunk -> uint16 array or uint64 bitset
+
+    @classmethod
+    def from_ids(cls, ids):
+        ids = np.unique(np.asarray(ids, dtype=np.uint32))
+        containers = {}
+        chunks = ids >> CHUNK_BITS
+        bounds = np.flatnonzero(np.diff(chunks)) + 1
+        for part in np.split(ids, bounds) if len(ids) else []:
+            containers[int(part[0] >> CHUNK_BITS)] = make_container((part & 0xFFFF).astype(np.uint16))
+        return cls(containers)
+
+    def __len__(self):
+        return sum(cardinality(container) for container in self.containers.values())
+
+    def __and__(self, other):
+        containers = {}
+        for chunk in self.containers.keys() & other.containers.keys():
+            container = and_containers(self.containers[chunk], other.containers[chunk])
+            if cardinality(container):
+                containers[chunk] = container
+        return RoaringBitmap(containers)
+
+    def __or__(self, other):
+        containers = dict(self.containers)
+        for chunk, container in other.containers.items():
+            containers[chunk] = or_containers(containers[chunk], container) if chunk in containers else container
+        return RoaringBitmap(containers)
+
+    def bitset(self, chunk):
+        """The chunk as a dense bitset, or None if it is empty."""
+        container = self.containers.get(chunk)
+        if container is None or container.dtype == np.uint64:
+            return container
+        return to_bitset(container)
+
+    def contains(self, ids):
+        """Boolean mask of which ids are in the bitmap."""
+        ids = np.asarray(ids, dtype=np.uint32)
+        mask = np.zeros(len(ids), dtype=bool)
+        chunks = ids >> CHUNK_BITS
+        for chunk in np.unique(chunks):
+            bits = self.bitset(int(chunk))
+            if bits is not None:
+                selected = chunks == chunk
+                mask[selected] = bitset_contains(bits, ids[selected] & 0xFFFF)
+        return mask
+
+    def to_ids(self):
+        parts = []
+        for chunk in sorted(self.containers):
+            container = self.containers[chunk]
+            low = bitset_to_array(container) if container.dtype == np.uint64 else container
+            parts.append((np.uint32(chunk) << CHUNK_BITS) | low.astype(np.uint32))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint32)
+
+def dense_chunks(bitmap):
+    """Every chunk of a bitmap as a bitset and as 65536 flags, for counting many values against it."""
+    dense = {}
+    for chunk in bitmap.containers:
+        bits = bitmap.bitset(chunk)
+        dense[chunk] = (bits, np.unpackbits(bits.view(np.uint8), bitorder='little').view(bool))
+    return dense
+
+class FacetColumn:
+    """
+    Bitmaps of every value of one facet, stored per chunk so all values are counted in one pass.
+
+    Per chunk, the array containers of all values are concatenated (`positions` with their
+    `value_ids`) and the bitset containers are stacked into a 2-D array.
+    """
+
+    def __init__(self, values, postings):
+        self.values = values
+        self.lookup = {value: index for index, value in enumerate(values)}
+        self.chunks = {}
+        arrays, bitsets = {}, {}
+        for value_id, ids in enumerate(postings):
+            for chunk, container in RoaringBitmap.from_ids(ids).containers.items():
+                target = bitsets if container.dtype == np.uint64 else arrays
+                target.setdefault(chunk, []).append((value_id, container))
+        for chunk in arrays.keys() | bitsets.keys():
+            array_parts = arrays.get(chunk, [])
+            bitset_parts = bitsets.get(chunk, [])
+            self.chunks[chunk] = (
+                np.concatenate([c for _, c in array_parts]) if array_parts else np.zeros(0, dtype=np.uint16),
+                np.concatenate([np.full(len(c), v, dtype=np.int32) for v, c in array_parts])
+                if array_parts else np.zeros(0, dtype=np.int32),
+                np.array([v for v, _ in bitset_parts], dtype=np.int32),
+                np.stack([c for _, c in bitset_parts]) if bitset_parts else np.zeros((0, BITSET_WORDS), dtype=np.uint64),
+            )
+
+    def bitmap(self, value):
+        """Bitmap of the documents having `value`; empty for unknown values."""
+        value_id = self.lookup.get(value)
+        containers = {}
+        if value_id is None:
+            return RoaringBitmap()
+        for chunk, (positions, value_ids, bitset_ids, bitsets) in self.chunks.items():
+            row = np.flatnonzero(bitset_ids == value_id)
+            if len(row):
+                containers[chunk] = bitsets[row[0]]
+            else:
+                low = positions[value_ids == value_id]
+                if len(low):
+                    containers[chunk] = low
+        return RoaringBitmap(containers)
+
+    def counts(self, dense):
+        """Count every value within a set given by dense_chunks()."""
+        counts = np.zeros(len(self.values), dtype=np.int64)
+        for chunk, (positions, value_ids, bitset_ids, bitsets) in self.chunks.items():
+            if chunk not in dense:
+                continue
+            bits, flags = dense[chunk]
+            if len(positions):
+                counts += np.bincount(value_ids[flags[positions]], minlength=len(self.values))
+            if len(bitset_ids):
+                counts[bitset_ids] += np.bitwise_count(bitsets & bits).sum(axis=1, dtype=np.int64)
+        return counts
+
+class FacetIndex:
+    """Per-value bitmaps of the facet columns of one catalogue version, keyed by doc_id."""
+
+    def __init__(self, doc_ids, columns):
+        """
+        :param doc_ids: doc_id of each row.
+        :param columns: Map of facet name to the row values of its column.
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.uint32)
+        self.all_docs = RoaringBitmap.from_ids(doc_ids)
+        self.columns = {}
+        for name, row_values in columns.items():
+            # Split each distinct column value into keywords once, then expand to its rows
+            codes, distinct = [], {}
+            for value in row_values:
+                codes.append(distinct.setdefault(value, len(distinct)))
+            codes = np.asarray(codes, dtype=np.int64)
+            order = np.argsort(codes, kind='stable')
+            rows_by_code = np.split(doc_ids[order], np.flatnonzero(np.diff(codes[order])) + 1)
+
+            keyword_rows = {}
+            for value, code in distinct.items():
+                for keyword in facet_values(value):
+                    keyword_rows.setdefault(keyword, []).append(rows_by_code[code])
+            values = sorted(keyword_rows)
+            self.columns[name] = FacetColumn(values, [np.concatenate(keyword_rows[value]) for value in values])
+
+    def filter(self, selected):
+        """Bitmap of the documents matching the selected facets: any value within a facet, every facet."""
+        result = None
+        for name, values in selected.items():
+            column = self.columns[name]
+            bitmap = RoaringBitmap()
+            for value in values:
+                bitmap = bitmap | column.bitmap(value)
+            result = bitmap if result is None else result & bitmap
+        return result
+
+    def counts(self, matched, selected=None, limit=10):
+        """
+        Top facet value counts within the matched documents.
+
+        A facet with selected values is counted without its own selection, so the
+        alternatives to what is selected keep their counts.
+        """
+        selected = selected or {}
+        candidates = matched
+        filters = {name: self.filter({name: values}) for name, values in selected.items()}
+        for bitmap in filters.values():
+            candidates = candidates & bitmap
+        dense = dense_chunks(candidates)
+
+        facets = {}
+        for name, column in self.columns.items():
+            if name in selected:
+                base = matched
+                for other, bitmap in filters.items():
+                    if other != name:
+                        base = base & bitmap
+                counts = column.counts(dense_chunks(base))
+            else:
+                counts = column.counts(dense)
+            top = np.argsort(-counts, kind='stable')[:limit]
+            facets[name] = {column.values[i]: int(counts[i]) for i in top if counts[i]}
+        return facets
@@ -1,6 +1,9 @@
+import threading
+import numpy as np
 from flask import Flask, request, jsonify
 import mysql.connector
 from mysql.connector import errorcode
+from facets import FACET_COLUMNS, FACET_NAMES, FacetIndex, RoaringBitmap
 
 app = Flask(__name__)
 
@@ -13,29 +16,205 @@ def get_db_connection():
             database="junaid_jamshed"
     )
     
+def build_search_query(search_query, min_price=None, max_price=None, pieces=None, sort=None):
+    """Build the search SQL; price and piece filters and price sorting use the B-tree indexes."""
+    conditions = []
+    params = []
+    if search_query:
+        relevance = ("MATCH(link, `Fabric Type`, Neckline, Collection, Trouser, Sleeves, Embellishment, Color, Shirt, Dupatta) "
+                     "AGAINST(%s IN NATURAL LANGUAGE MODE)")
+        params.append(search_query)
+        # When sorting by price, only rows matching the text query are candidates
+        if sort in ('price', '-price'):
+            conditions.append(f"{relevance} > 0")
+            params.append(search_query)
+    else:
+        relevance = "0"
+
+    # Prices are given in rupees and stored in paisa
+    if min_price is not None:
+        conditions.append("price_minor >= %s")
+        params.append(round(min_price * 100))
+    if max_price is not None:
+        conditions.append("price_minor <= %s")
+        params.append(round(max_price * 100))
+    if pieces is not None:
+        conditions.append("pieces = %s")
+        params.append(pieces)
+
+    if sort == 'price':
+        order = "price_minor ASC"
+    elif sort == '-price':
+        order = "price_minor DESC"
+    else:
+        order = "relevance DESC"
+
+    query = f"""
+    SELECT link, code, price, price_minor, {relevance} AS relevance
+    FROM products
+    {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+    ORDER BY {order}
+    LIMIT 10;
+    """
+    return query, tuple(params)
+
+def build_matched_query(search_query, min_price=None, max_price=None, pieces=None):
+    """
+    Build the SQL for the whole matched set: doc_id, relevance and price of every matching row.
+
+    Unlike build_search_query this moves every match to the service, O(matched) rows per request,
+    so it is only used when facet counts or facet filters need the matched set.
+    """
+    conditions = []
+    params = []
+    if search_query:
+        relevance = ("MATCH(link, `Fabric Type`, Neckline, Collection, Trouser, Sleeves, Embellishment, Color, Shirt, Dupatta) "
+                     "AGAINST(%s IN NATURAL LANGUAGE MODE)")
+        params.append(search_query)
+        conditions.append(f"{relevance} > 0")
+        params.append(search_query)
+    else:
+        relevance = "0"
+
+    # Prices are given in rupees and stored in paisa
+    if min_price is not None:
+        conditions.append("price_minor >= %s")
+        params.append(round(min_price * 100))
+    if max_price is not None:
+        conditions.append("price_minor <= %s")
+        params.append(round(max_price * 100))
+    if pieces is not None:
+        conditions.append("pieces = %s")
+        params.append(pieces)
+
+    query = f"""
+    SELECT doc_id, {relevance} AS relevance, price_minor
+    FROM products
+    {'WHERE ' + ' AND '.join(conditions) if conditions else ''};
+    """
+    return query, tuple(params)
+
+# Facet bitmaps of the live catalogue version, rebuilt when a reload swaps in a new table
+_catalogue = {'version': None, 'facets': None, 'price_minor': None}
+_catalogue_lock = threading.Lock()
+
+def catalogue_version(cursor):
+    """Version number of the live catalogue; every reload swaps in a new products_version with the table."""
+    try:
+        cursor.execute("SELECT MAX(version) AS version FROM products_version;")
+    except mysql.connector.Error:
+        # Tables loaded before versions were kept are never reloaded in place
+        return None
+    row = cursor.fetchone()
+    return row['version'] if row else None
+
+def get_catalogue(cursor):
+    """The facet index and per-doc_id prices of the live catalogue, built once per version."""
+    with _catalogue_lock:
+        version = catalogue_version(cursor)
+        if _catalogue['facets'] is None or _catalogue['version'] != version:
+            columns = ', '.join(f"`{column}`" for column in FACET_COLUMNS.values())
+            cursor.execute(f"SELECT doc_id, price_minor, pieces, {columns} FROM products;")
+            rows = cursor.fetchall()
+            doc_ids = [row['doc_id'] for row in rows]
+            prices = np.full(max(doc_ids, default=-1) + 1, np.nan)
+            prices[doc_ids] = [np.nan if row['price_minor'] is None else row['price_minor'] for row in rows]
+            values = {name: [row[column] for row in rows] for name, column in FACET_COLUMNS.items()}
+            values['size'] = [(f"{row['pieces']} piece",) if row['pieces'] else () for row in rows]
+            facets = FacetIndex(doc_ids, values)
+            _catalogue.update(version=version, facets=facets, price_minor=prices)
+            print(f"Facet index built for {len(rows)} products.")
+        return _catalogue['facets'], _catalogue['price_minor']
+
+def rank(relevance, price_minor, sort=None, limit=10):
+    """Positions of the top results, by relevance or by price; unpriced products go last."""
+    if sort == 'price':
+        key = price_minor
+    elif sort == '-price':
+        key = -price_minor
+    else:
+        key = -relevance
+    if len(key) > limit:
+        top = np.argpartition(key, limit)[:limit]
+        return top[np.argsort(key[top], kind='stable')]
+    return np.argsort(key, kind='stable')
+
+def number_arg(name, cast):
+    """Read an optional numeric query parameter, raising ValueError if it is not a number."""
+    value = request.args.get(name, '')
+    return cast(value) if value else None
+
 @app.route('/search', methods=['GET'])
 def search():
     search_query = request.args.get('query', '')
+    try:
+        min_price = number_arg('min_price', float)
+        max_price = number_arg('max_price', float)
+        pieces = number_arg('pieces', int)
+    except ValueError:
+        return jsonify({'error': "min_price, max_price and pieces must be numbers"}), 400
+    sort = request.args.get('sort')
+    if sort not in (None, 'relevance', 'price', '-price'):
+        return jsonify({'error': "sort must be one of relevance, price, -price"}), 400
+
+    # Selected facet values, e.g. ?color=blue&color=black&size=3 piece, and ?facets=1 for facet counts
+    # Facet values are indexed in lower case, see facet_values
+    selected = {name: [value.strip().lower() for value in request.args.getlist(name)]
+                for name in FACET_NAMES if request.args.getlist(name)}
+    with_counts = request.args.get('facets', '').lower() in ('1', 'true', 'yes')
 
     connection = get_db_connection()
     cursor = connection.cursor(dictionary=True)
     cursor.execute("use junaid_jamshed;")
-    query = """
-    SELECT link, code,
-    MATCH(link, `Fabric Type`, Neckline, Collection, Trouser, Sleeves, Embellishment, Color, Shirt, Dupatta)
-    AGAINST(%s IN NATURAL LANGUAGE MODE) AS relevance
-    FROM products
-    ORDER BY relevance DESC
-    LIMIT 10;
-    """
     print("Query: ", search_query)
-    cursor.execute(query, (search_query,))
-    results = cursor.fetchall()
-    
+
+    if not selected and not with_counts:
+        # No facets involved: the top 10 come straight from the FULLTEXT and price indexes
+        query, params = build_search_query(search_query, min_price, max_price, pieces, sort)
+        cursor.execute(query, params)
+        results = cursor.fetchall()
+        cursor.close()
+        connection.close()
+        return jsonify({'results': results})
+
+    facets, prices = get_catalogue(cursor)
+    if search_query or min_price is not None or max_price is not None or pieces is not None:
+        query, params = build_matched_query(search_query, min_price, max_price, pieces)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        doc_ids = np.array([row['doc_id'] for row in rows], dtype=np.uint32)
+        relevance = np.array([row['relevance'] for row in rows], dtype=float)
+        price_minor = np.array([np.nan if row['price_minor'] is None else row['price_minor'] for row in rows], dtype=float)
+        matched = RoaringBitmap.from_ids(doc_ids)
+    else:
+        # No text query or filters: the whole catalogue matches and the index has everything needed
+        matched = facets.all_docs
+        doc_ids = matched.to_ids()
+        relevance = np.zeros(len(doc_ids))
+        price_minor = prices[doc_ids]
+
+    # Selected facets narrow the matched set before ranking
+    if selected:
+        keep = facets.filter(selected).contains(doc_ids)
+        doc_ids, relevance, price_minor = doc_ids[keep], relevance[keep], price_minor[keep]
+    top = rank(relevance, price_minor, sort)
+
+    results = []
+    if len(top):
+        top_ids = [int(doc_id) for doc_id in doc_ids[top]]
+        cursor.execute(f"SELECT doc_id, link, code, price, price_minor FROM products "
+                       f"WHERE doc_id IN ({', '.join(['%s'] * len(top_ids))});", tuple(top_ids))
+        by_id = {row.pop('doc_id'): row for row in cursor.fetchall()}
+        for doc_id, score in zip(top_ids, relevance[top]):
+            results.append(dict(by_id[doc_id], relevance=float(score)))
+
     cursor.close()
     connection.close()
-    
-    return jsonify(results)
+
+    response = {'results': results, 'total': len(doc_ids)}
+    if with_counts:
+        response['facets'] = facets.counts(matched, selected)
+    return jsonify(response)
 
 
 if __name__ == '__main__':